@@ -16,7 +16,7 @@ from app.models import *  # noqa
 config = context.config
 config.set_main_option(
     "sqlalchemy.url",
-    settings.database_url.replace("+asyncpg", "")  # Use sync driver for migrations
+    (settings.migration_database_url or settings.database_url).replace("+asyncpg", "")  # Use sync driver for migrations
 )
 
 if config.config_file_name is not None:
@@ -0,0 +1,45 @@
+"""money_cents_columns
+
+Revision ID: 3de4de537257
+Revises: 4a765d7cd218
+Create Date: 2026-10-15 23:03:38.951727
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3de4de537257'
+down_revision: Union[str, None] = '4a765d7cd218'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (table, Numeric(20, 2) money column) pairs that get a BIGINT *_cents mirror
+_MONEY_COLUMNS = [
+    ('trd_buy', 'total_sum'),
+    ('lots', 'amount'),
+    ('trd_app_lots', 'price'),
+    ('trd_app_lots', 'amount'),
+    ('trd_app_lots', 'discount_price'),
+    ('contract', 'contract_sum_wnds'),
+    ('treasury_pay', 'pay_amount'),
+]
+
+
+def upgrade() -> None:
+    # Stored generated columns: adding one rewrites the table once, after that
+    # Postgres keeps them in sync with every INSERT/UPDATE/COPY merge.
+    for table, column in _MONEY_COLUMNS:
+        op.add_column(table, sa.Column(
+            f'{column}_cents', sa.BigInteger(),
+            sa.Computed(f'round({column} * 100)::bigint', persisted=True),
+        ))
+
+
+def downgrade() -> None:
+    for table, column in reversed(_MONEY_COLUMNS):
+        op.drop_column(table, f'{column}_cents')
@@ -0,0 +1,34 @@
+"""mv_linked_lots
+
+Revision ID: 4a765d7cd218
+Revises: 644fc22412ba
+Create Date: 2026-10-15 23:02:06.202491
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4a765d7cd218'
+down_revision: Union[str, None] = '644fc22412ba'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # DISTINCT: a tender can have several contracts, the view keeps one row per lot
+    op.execute(
+        "CREATE MATERIALIZED VIEW mv_linked_lots AS "
+        "SELECT DISTINCT l.id AS lot_id FROM lots l "
+        "JOIN contract c ON c.trd_buy_id = l.trd_buy_id "
+        "WHERE l.is_deleted = false AND c.is_deleted = false"
+    )
+    # REFRESH ... CONCURRENTLY requires a unique index on the view
+    op.create_index('ix_mv_linked_lots', 'mv_linked_lots', ['lot_id'], unique=True)
+
+
+def downgrade() -> None:
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS mv_linked_lots")
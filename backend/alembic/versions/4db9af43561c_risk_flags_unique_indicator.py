@@ -0,0 +1,38 @@
+"""risk_flags_unique_indicator
+
+Revision ID: 4db9af43561c
+Revises: 702debef938d
+Create Date: 2026-10-15 22:54:25.327045
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4db9af43561c'
+down_revision: Union[str, None] = '702debef938d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Keep only the most recent row per (entity_type, entity_id, indicator_code)
+    # so the unique index can be built over existing data.
+    op.execute("""
+        DELETE FROM risk_flags rf
+        USING risk_flags newer
+        WHERE rf.entity_type = newer.entity_type
+          AND rf.entity_id = newer.entity_id
+          AND rf.indicator_code = newer.indicator_code
+          AND rf.id < newer.id
+    """)
+    op.drop_index('ix_risk_flags_indicator', table_name='risk_flags')
+    op.create_index('ix_risk_flags_indicator', 'risk_flags', ['entity_type', 'entity_id', 'indicator_code'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_risk_flags_indicator', table_name='risk_flags')
+    op.create_index('ix_risk_flags_indicator', 'risk_flags', ['entity_type', 'entity_id', 'indicator_code'], unique=False)
@@ -0,0 +1,28 @@
+"""risk_scores_flags_mask
+
+Revision ID: 63d8a9ad4ee2
+Revises: b8e2658e2cca
+Create Date: 2026-10-15 23:08:17.972305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '63d8a9ad4ee2'
+down_revision: Union[str, None] = 'b8e2658e2cca'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Filled in by the next FeatureEngine run; 0 until then
+    op.add_column('risk_scores', sa.Column('flags_mask', sa.BigInteger(),
+                  nullable=False, server_default='0'))
+
+
+def downgrade() -> None:
+    op.drop_column('risk_scores', 'flags_mask')
@@ -0,0 +1,41 @@
+"""raw_payload_gin_indexes
+
+Revision ID: 644fc22412ba
+Revises: 64a7bc27f725
+Create Date: 2026-10-15 23:01:37.748409
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '644fc22412ba'
+down_revision: Union[str, None] = '64a7bc27f725'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+_RAW_TABLES = [
+    'raw_trdbuy', 'raw_lots', 'raw_trdapp', 'raw_contract',
+    'raw_subject', 'raw_rnu', 'raw_journal',
+]
+
+
+def upgrade() -> None:
+    # CONCURRENTLY cannot run inside the migration transaction.
+    with op.get_context().autocommit_block():
+        for table in _RAW_TABLES:
+            op.create_index(f'ix_{table}_payload_gin', table, ['payload_jsonb'],
+                            postgresql_using='gin',
+                            postgresql_ops={'payload_jsonb': 'jsonb_path_ops'},
+                            postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for table in reversed(_RAW_TABLES):
+            op.drop_index(f'ix_{table}_payload_gin', table_name=table,
+                          postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,32 @@
+"""mv_contract_buy_ids
+
+Revision ID: 64a7bc27f725
+Revises: e4950e10483a
+Create Date: 2026-10-15 22:59:05.000775
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '64a7bc27f725'
+down_revision: Union[str, None] = 'e4950e10483a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        "CREATE MATERIALIZED VIEW mv_contract_buy_ids AS "
+        "SELECT DISTINCT trd_buy_id FROM contract "
+        "WHERE trd_buy_id IS NOT NULL AND is_deleted = false"
+    )
+    # REFRESH ... CONCURRENTLY requires a unique index on the view
+    op.create_index('ix_mv_contract_buy_ids', 'mv_contract_buy_ids', ['trd_buy_id'], unique=True)
+
+
+def downgrade() -> None:
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS mv_contract_buy_ids")
@@ -0,0 +1,37 @@
+"""risk_scores_unique_entity
+
+Revision ID: 6a387ebe0817
+Revises: 4db9af43561c
+Create Date: 2026-10-15 22:55:22.993835
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6a387ebe0817'
+down_revision: Union[str, None] = '4db9af43561c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Keep only the most recent score per (entity_type, entity_id) so the
+    # ON CONFLICT target used by FeatureEngine has a backing unique index.
+    op.execute("""
+        DELETE FROM risk_scores rs
+        USING risk_scores newer
+        WHERE rs.entity_type = newer.entity_type
+          AND rs.entity_id = newer.entity_id
+          AND rs.id < newer.id
+    """)
+    op.drop_index('ix_risk_scores_entity', table_name='risk_scores')
+    op.create_index('ix_risk_scores_entity', 'risk_scores', ['entity_type', 'entity_id'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_risk_scores_entity', table_name='risk_scores')
+    op.create_index('ix_risk_scores_entity', 'risk_scores', ['entity_type', 'entity_id'], unique=False)
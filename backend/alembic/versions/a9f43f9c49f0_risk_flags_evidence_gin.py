@@ -0,0 +1,33 @@
+"""risk_flags_evidence_gin
+
+Revision ID: a9f43f9c49f0
+Revises: bb89b7d90f20
+Create Date: 2026-10-15 23:05:52.239025
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9f43f9c49f0'
+down_revision: Union[str, None] = 'bb89b7d90f20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY cannot run inside the migration transaction.
+    with op.get_context().autocommit_block():
+        op.create_index('ix_risk_flags_evidence_gin', 'risk_flags', ['evidence_jsonb'],
+                        postgresql_using='gin',
+                        postgresql_ops={'evidence_jsonb': 'jsonb_path_ops'},
+                        postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_risk_flags_evidence_gin', table_name='risk_flags',
+                      postgresql_concurrently=True, if_exists=True)
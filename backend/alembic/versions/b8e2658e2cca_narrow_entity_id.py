@@ -0,0 +1,38 @@
+"""narrow_entity_id
+
+Revision ID: b8e2658e2cca
+Revises: a9f43f9c49f0
+Create Date: 2026-10-15 23:07:07.179844
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8e2658e2cca'
+down_revision: Union[str, None] = 'a9f43f9c49f0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# entity_id holds a lot/tender id or a 12-digit BIN/IIN; 32 fits both
+_TABLES = ['risk_flags', 'risk_scores', 'analyst_notes']
+
+
+def upgrade() -> None:
+    for table in _TABLES:
+        op.alter_column(table, 'entity_id',
+                   existing_type=sa.VARCHAR(length=255),
+                   type_=sa.String(length=32),
+                   existing_nullable=False)
+
+
+def downgrade() -> None:
+    for table in _TABLES:
+        op.alter_column(table, 'entity_id',
+                   existing_type=sa.String(length=32),
+                   type_=sa.VARCHAR(length=255),
+                   existing_nullable=False)
@@ -0,0 +1,50 @@
+"""covering_trd_buy_id_indexes
+
+Revision ID: bb89b7d90f20
+Revises: 3de4de537257
+Create Date: 2026-10-15 23:05:24.507098
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'bb89b7d90f20'
+down_revision: Union[str, None] = '3de4de537257'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+_LIVE = sa.text('is_deleted = false')
+
+
+def upgrade() -> None:
+    # CONCURRENTLY cannot run inside the migration transaction.
+    with op.get_context().autocommit_block():
+        # Build the covering version next to the old one, then swap names, so
+        # lots is never without a live trd_buy_id index.
+        op.create_index('ix_lots_trd_buy_id_live_new', 'lots', ['trd_buy_id'],
+                        postgresql_include=['id'], postgresql_where=_LIVE,
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.drop_index('ix_lots_trd_buy_id_live', table_name='lots',
+                      postgresql_concurrently=True, if_exists=True)
+        op.execute('ALTER INDEX ix_lots_trd_buy_id_live_new RENAME TO ix_lots_trd_buy_id_live')
+        op.create_index('ix_contract_trd_buy_id_live', 'contract', ['trd_buy_id'],
+                        postgresql_include=['id', 'supplier_biin', 'contract_sum_wnds'],
+                        postgresql_where=_LIVE,
+                        postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_contract_trd_buy_id_live', table_name='contract',
+                      postgresql_concurrently=True, if_exists=True)
+        op.create_index('ix_lots_trd_buy_id_live_old', 'lots', ['trd_buy_id'],
+                        postgresql_where=_LIVE,
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.drop_index('ix_lots_trd_buy_id_live', table_name='lots',
+                      postgresql_concurrently=True, if_exists=True)
+        op.execute('ALTER INDEX ix_lots_trd_buy_id_live_old RENAME TO ix_lots_trd_buy_id_live')
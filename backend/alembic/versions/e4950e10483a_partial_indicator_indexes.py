@@ -0,0 +1,53 @@
+"""partial_indicator_indexes
+
+Revision ID: e4950e10483a
+Revises: 6a387ebe0817
+Create Date: 2026-10-15 22:55:48.338964
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4950e10483a'
+down_revision: Union[str, None] = '6a387ebe0817'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+_LIVE = sa.text('is_deleted = false')
+
+
+def upgrade() -> None:
+    # CONCURRENTLY cannot run inside the migration transaction.
+    with op.get_context().autocommit_block():
+        op.create_index('ix_contract_supplier_biin_live', 'contract', ['supplier_biin'],
+                        postgresql_where=_LIVE, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_contract_customer_bin_live', 'contract', ['customer_bin', 'sign_date'],
+                        postgresql_where=_LIVE, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_lots_trd_buy_id_live', 'lots', ['trd_buy_id'],
+                        postgresql_where=_LIVE, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_subject_iin', 'subject', ['iin'],
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_subject_phone', 'subject', ['phone'],
+                        postgresql_where=sa.text('phone IS NOT NULL'),
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_subject_email', 'subject', ['email'],
+                        postgresql_where=sa.text('email IS NOT NULL'),
+                        postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table in [
+            ('ix_subject_email', 'subject'),
+            ('ix_subject_phone', 'subject'),
+            ('ix_subject_iin', 'subject'),
+            ('ix_lots_trd_buy_id_live', 'lots'),
+            ('ix_contract_customer_bin_live', 'contract'),
+            ('ix_contract_supplier_biin_live', 'contract'),
+        ]:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -24,7 +24,7 @@ async def get_customer_profile(
     stats_result = await db.execute(
         select(
             func.count(Contract.id).label("total_contracts"),
-            func.sum(Contract.contract_sum_wnds).label("total_sum"),
+            func.sum(Contract.contract_sum_wnds_cents).label("total_sum"),
             func.count(func.distinct(Contract.supplier_biin)).label("unique_suppliers"),
         ).where(Contract.customer_bin == bin, Contract.is_deleted == False)
     )
@@ -32,7 +32,7 @@ async def get_customer_profile(
 
     # Top suppliers
     top_suppliers_result = await db.execute(
-        select(Contract.supplier_biin, func.count(Contract.id).label("cnt"), func.sum(Contract.contract_sum_wnds).label("total"))
+        select(Contract.supplier_biin, func.count(Contract.id).label("cnt"), func.sum(Contract.contract_sum_wnds_cents).label("total"))
         .where(Contract.customer_bin == bin, Contract.is_deleted == False)
         .group_by(Contract.supplier_biin)
         .order_by(func.count(Contract.id).desc())
@@ -60,11 +60,11 @@ async def get_customer_profile(
         },
         "stats": {
             "total_contracts": stats.total_contracts or 0,
-            "total_sum": float(stats.total_sum or 0),
+            "total_sum": int(stats.total_sum or 0) / 100,
             "unique_suppliers": stats.unique_suppliers or 0,
         },
         "top_suppliers": [
-            {"supplier_biin": r.supplier_biin, "contract_count": r.cnt, "total_sum": float(r.total or 0)}
+            {"supplier_biin": r.supplier_biin, "contract_count": r.cnt, "total_sum": int(r.total or 0) / 100}
             for r in top_suppliers
         ],
         "high_risk_lots": [
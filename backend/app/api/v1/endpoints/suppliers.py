@@ -30,7 +30,7 @@ async def get_supplier_profile(
     stats_result = await db.execute(
         select(
             func.count(Contract.id).label("total_contracts"),
-            func.sum(Contract.contract_sum_wnds).label("total_sum"),
+            func.sum(Contract.contract_sum_wnds_cents).label("total_sum"),
             func.count(func.distinct(Contract.customer_bin)).label("unique_customers"),
         ).where(Contract.supplier_biin == biin, Contract.is_deleted == False)
     )
@@ -38,7 +38,7 @@ async def get_supplier_profile(
 
     # Top customers
     top_customers_result = await db.execute(
-        select(Contract.customer_bin, func.count(Contract.id).label("cnt"), func.sum(Contract.contract_sum_wnds).label("total"))
+        select(Contract.customer_bin, func.count(Contract.id).label("cnt"), func.sum(Contract.contract_sum_wnds_cents).label("total"))
         .where(Contract.supplier_biin == biin, Contract.is_deleted == False)
         .group_by(Contract.customer_bin)
         .order_by(func.count(Contract.id).desc())
@@ -68,11 +68,11 @@ async def get_supplier_profile(
         },
         "stats": {
             "total_contracts": stats.total_contracts or 0,
-            "total_sum": float(stats.total_sum or 0),
+            "total_sum": int(stats.total_sum or 0) / 100,
             "unique_customers": stats.unique_customers or 0,
         },
         "top_customers": [
-            {"customer_bin": r.customer_bin, "contract_count": r.cnt, "total_sum": float(r.total or 0)}
+            {"customer_bin": r.customer_bin, "contract_count": r.cnt, "total_sum": int(r.total or 0) / 100}
             for r in top_customers
         ],
         "rnu": {
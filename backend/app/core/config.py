@@ -14,6 +14,12 @@ class Settings(BaseSettings):
     postgres_db: str = "tender_radar"
     postgres_host: str = "postgres"
     postgres_port: int = 5432
+    # Direct Postgres URL for Alembic when database_url points at PgBouncer
+    migration_database_url: str = ""
+    db_pool_size: int = 20
+    db_max_overflow: int = 10
+    db_query_cache_size: int = 1200
+    db_prepared_statement_cache_size: int = 1024
 
     # Redis & Celery
     redis_url: str = "redis://redis:6379/0"
@@ -38,6 +44,9 @@ class Settings(BaseSettings):
     etl_rate_limit_delay: float = 0.5
     etl_max_retries: int = 3
     etl_page_size: int = 50
+    # OWS accepts filter[<field>]=id1,id2,... on /v3/lots and /v3/trd-app:
+    # load_linked then asks only for tenders with a contract instead of scanning
+    etl_ows_id_filter: bool = False
 
     @property
     def cors_origins_list(self) -> list[str]:
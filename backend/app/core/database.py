@@ -6,8 +6,12 @@ engine = create_async_engine(
     settings.database_url,
     echo=settings.app_env == "development",
     pool_pre_ping=True,
-    pool_size=10,
-    max_overflow=20,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    # Keep compiled SQL and server-side prepared statements warm across the
+    # FeatureEngine's hot indicator loop.
+    query_cache_size=settings.db_query_cache_size,
+    connect_args={"prepared_statement_cache_size": settings.db_prepared_statement_cache_size},
 )
 
 AsyncSessionLocal = async_sessionmaker(
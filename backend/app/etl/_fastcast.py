@@ -0,0 +1,46 @@
+"""
+Per-field casts of OWS values, called for every date / money field the
+loaders write. Kept in their own module, fully annotated and free of
+dynamic tricks, so it can be compiled AOT with mypyc (the Docker image does
+this), from backend/:
+
+    mypyc --explicit-package-bases app/etl/_fastcast.py
+
+The compiled extension is picked up ahead of this file on import; without
+it the plain Python version runs unchanged.
+"""
+from datetime import datetime
+from typing import Any, Optional
+
+from ciso8601 import parse_datetime as _parse_iso
+
+
+def _parse_dt(val: Any) -> Optional[datetime]:
+    if not val:
+        return None
+    if isinstance(val, datetime):
+        return val
+    if not isinstance(val, str):
+        return None
+    # OWS sends "YYYY-MM-DD HH:MM:SS[.ffffff]" or ISO "YYYY-MM-DDTHH:MM:SS...";
+    # ciso8601 (C) takes either separator, the slice drops fractions/offsets.
+    try:
+        return _parse_iso(val[:19])
+    except ValueError:
+        return None
+
+
+def _safe_decimal(val: Any) -> Optional[float]:
+    if val is None:
+        return None
+    # Exact type checks first: OWS numbers arrive as float/int, only strings
+    # and oddities need the try.
+    t = type(val)
+    if t is float:
+        return val
+    if t is int:
+        return float(val)
+    try:
+        return float(val)
+    except (TypeError, ValueError):
+        return None
@@ -1,9 +1,11 @@
 import logging
 from datetime import datetime, date
-from typing import Any
+from sqlalchemy import insert, update
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.etl._fastcast import _parse_dt, _safe_decimal
+from app.etl.bulk import upsert_stmt
 from app.etl.client import OWSClient
+from app.etl.views import MV_CONTRACT_BUY_IDS, MV_LINKED_LOTS, refresh_view
 from app.models.procurement import (
     RawTrdBuy, RawLots, RawTrdApp, RawContract, RawSubject, RawRnu,
     TrdBuy, Lot, TrdApp, TrdAppLot, Contract, Subject, Rnu, TreasuryPay,
@@ -13,23 +15,22 @@ from app.core.database import AsyncSessionLocal
 
 logger = logging.getLogger(__name__)
 
-
-def _parse_dt(val: Any) -> datetime | None:
-    if not val:
-        return None
-    if isinstance(val, datetime):
-        return val
-    try:
-        return datetime.fromisoformat(str(val).replace(" ", "T").split(".")[0])
-    except Exception:
-        return None
-
-
-def _safe_decimal(val: Any):
-    try:
-        return float(val) if val is not None else None
-    except Exception:
-        return None
+# Upserts built once at import; executed with a list of rows (executemany)
+SUBJECT_UPSERT = upsert_stmt(Subject, [
+    "name_ru", "regdate", "crdate", "mark_small_employer",
+    "mark_resident", "email", "phone", "last_update_at",
+])
+TRD_BUY_UPSERT = upsert_stmt(TrdBuy, ["ref_buy_status_id", "total_sum", "last_update_at"])
+LOT_UPSERT = upsert_stmt(Lot, ["amount", "ref_lot_status_id", "dumping_flag", "last_update_at"])
+TRD_APP_UPSERT = upsert_stmt(TrdApp, ["last_update_at"])
+TRD_APP_LOT_UPSERT = upsert_stmt(TrdAppLot, ["status_id", "price", "amount"])
+CONTRACT_UPSERT = upsert_stmt(Contract, [
+    "contract_sum_wnds", "fakt_sum", "fakt_exec_date",
+    "ref_contract_status_id", "last_update_at",
+])
+RNU_UPSERT = upsert_stmt(Rnu, ["end_date", "is_active"])
+TREASURY_PAY_UPSERT = upsert_stmt(TreasuryPay, ["pay_amount"])
+ETL_CURSOR_UPSERT = upsert_stmt(EtlCursor, ["cursor_value", "updated_at"], index_elements=["source_name"])
 
 
 class BackfillETL:
@@ -60,6 +61,8 @@ class BackfillETL:
             logger.error(f"Backfill failed: {e}")
             await self._finish_run(run_id, "failed", {"error": str(e)})
             raise
+        finally:
+            await self.client.aclose()
 
         return summary
 
@@ -109,15 +112,7 @@ class BackfillETL:
                         "is_deleted": False,
                     })
                 if rows:
-                    stmt = pg_insert(Subject).values(rows)
-                    stmt = stmt.on_conflict_do_update(
-                        index_elements=["id"],
-                        set_={c: stmt.excluded[c] for c in [
-                            "name_ru", "regdate", "crdate", "mark_small_employer",
-                            "mark_resident", "email", "phone", "last_update_at",
-                        ]},
-                    )
-                    await db.execute(stmt)
+                    await db.execute(SUBJECT_UPSERT, rows)
                     await db.commit()
                     count += len(rows)
                     logger.info(f"Subjects upserted: {count}")
@@ -155,14 +150,7 @@ class BackfillETL:
                         "is_deleted": False,
                     })
                 if rows:
-                    stmt = pg_insert(TrdBuy).values(rows)
-                    stmt = stmt.on_conflict_do_update(
-                        index_elements=["id"],
-                        set_={c: stmt.excluded[c] for c in [
-                            "ref_buy_status_id", "total_sum", "last_update_at",
-                        ]},
-                    )
-                    await db.execute(stmt)
+                    await db.execute(TRD_BUY_UPSERT, rows)
                     await db.commit()
                     count += len(rows)
                     logger.info(f"TrdBuy upserted: {count}")
@@ -195,14 +183,7 @@ class BackfillETL:
                         "is_deleted": False,
                     })
                 if rows:
-                    stmt = pg_insert(Lot).values(rows)
-                    stmt = stmt.on_conflict_do_update(
-                        index_elements=["id"],
-                        set_={c: stmt.excluded[c] for c in [
-                            "amount", "ref_lot_status_id", "dumping_flag", "last_update_at",
-                        ]},
-                    )
-                    await db.execute(stmt)
+                    await db.execute(LOT_UPSERT, rows)
                     await db.commit()
                     count += len(rows)
                     logger.info(f"Lots upserted: {count}")
@@ -241,20 +222,10 @@ class BackfillETL:
                         })
 
                 if app_rows:
-                    stmt = pg_insert(TrdApp).values(app_rows)
-                    stmt = stmt.on_conflict_do_update(
-                        index_elements=["id"],
-                        set_={"last_update_at": stmt.excluded.last_update_at},
-                    )
-                    await db.execute(stmt)
+                    await db.execute(TRD_APP_UPSERT, app_rows)
 
                 if app_lot_rows:
-                    stmt = pg_insert(TrdAppLot).values(app_lot_rows)
-                    stmt = stmt.on_conflict_do_update(
-                        index_elements=["id"],
-                        set_={c: stmt.excluded[c] for c in ["status_id", "price", "amount"]},
-                    )
-                    await db.execute(stmt)
+                    await db.execute(TRD_APP_LOT_UPSERT, app_lot_rows)
 
                 await db.commit()
                 count += len(app_rows)
@@ -298,15 +269,7 @@ class BackfillETL:
                         "is_deleted": False,
                     })
                 if rows:
-                    stmt = pg_insert(Contract).values(rows)
-                    stmt = stmt.on_conflict_do_update(
-                        index_elements=["id"],
-                        set_={c: stmt.excluded[c] for c in [
-                            "contract_sum_wnds", "fakt_sum", "fakt_exec_date",
-                            "ref_contract_status_id", "last_update_at",
-                        ]},
-                    )
-                    await db.execute(stmt)
+                    await db.execute(CONTRACT_UPSERT, rows)
                     await db.commit()
                     count += len(rows)
                     logger.info(f"Contracts upserted: {count}")
@@ -330,12 +293,7 @@ class BackfillETL:
                         "is_active": True,
                     })
                 if rows:
-                    stmt = pg_insert(Rnu).values(rows)
-                    stmt = stmt.on_conflict_do_update(
-                        index_elements=["id"],
-                        set_={c: stmt.excluded[c] for c in ["end_date", "is_active"]},
-                    )
-                    await db.execute(stmt)
+                    await db.execute(RNU_UPSERT, rows)
                     await db.commit()
                     count += len(rows)
                     logger.info(f"RNU upserted: {count}")
@@ -367,12 +325,7 @@ class BackfillETL:
                         "system_id": item.get("system_id"),
                     })
                 if rows:
-                    stmt = pg_insert(TreasuryPay).values(rows)
-                    stmt = stmt.on_conflict_do_update(
-                        index_elements=["id"],
-                        set_={"pay_amount": stmt.excluded.pay_amount},
-                    )
-                    await db.execute(stmt)
+                    await db.execute(TREASURY_PAY_UPSERT, rows)
                     await db.commit()
                     count += len(rows)
                     logger.info(f"TreasuryPay upserted: {count}")
@@ -389,34 +342,31 @@ class BackfillETL:
         if not cursor_value:
             return
         async with AsyncSessionLocal() as db:
-            stmt = pg_insert(EtlCursor).values(
-                source_name=source_name,
-                cursor_value=cursor_value,
-                updated_at=datetime.utcnow(),
-            )
-            stmt = stmt.on_conflict_do_update(
-                index_elements=["source_name"],
-                set_={"cursor_value": stmt.excluded.cursor_value, "updated_at": stmt.excluded.updated_at},
-            )
-            await db.execute(stmt)
+            await db.execute(ETL_CURSOR_UPSERT, {
+                "source_name": source_name,
+                "cursor_value": cursor_value,
+                "updated_at": datetime.utcnow(),
+            })
             await db.commit()
 
     async def _start_run(self) -> int:
         async with AsyncSessionLocal() as db:
-            run = EtlRun(
-                run_type="backfill",
-                started_at=datetime.utcnow(),
-                status="running",
-                summary_jsonb={"date_from": self.date_from, "date_to": self.date_to},
+            # INSERT ... RETURNING id: one round-trip, no refresh SELECT
+            run_id = await db.scalar(
+                insert(EtlRun)
+                .values(
+                    run_type="backfill",
+                    started_at=datetime.utcnow(),
+                    status="running",
+                    summary_jsonb={"date_from": self.date_from, "date_to": self.date_to},
+                )
+                .returning(EtlRun.id)
             )
-            db.add(run)
             await db.commit()
-            await db.refresh(run)
-            return run.id
+            return run_id
 
     async def _finish_run(self, run_id: int, status: str, summary: dict):
         async with AsyncSessionLocal() as db:
-            from sqlalchemy import update
             await db.execute(
                 update(EtlRun)
                 .where(EtlRun.id == run_id)
@@ -482,15 +432,7 @@ class BackfillETL:
                         "is_deleted": False,
                     })
                 if rows:
-                    stmt = pg_insert(Subject).values(rows)
-                    stmt = stmt.on_conflict_do_update(
-                        index_elements=["id"],
-                        set_={c: stmt.excluded[c] for c in [
-                            "name_ru", "regdate", "crdate", "mark_small_employer",
-                            "mark_resident", "email", "phone", "last_update_at",
-                        ]},
-                    )
-                    await db.execute(stmt)
+                    await db.execute(SUBJECT_UPSERT, rows)
                     await db.commit()
                     count += len(rows)
                     
@@ -537,14 +479,7 @@ class BackfillETL:
                         "is_deleted": False,
                     })
                 if rows:
-                    stmt = pg_insert(TrdBuy).values(rows)
-                    stmt = stmt.on_conflict_do_update(
-                        index_elements=["id"],
-                        set_={c: stmt.excluded[c] for c in [
-                            "ref_buy_status_id", "total_sum", "last_update_at",
-                        ]},
-                    )
-                    await db.execute(stmt)
+                    await db.execute(TRD_BUY_UPSERT, rows)
                     await db.commit()
                     count += len(rows)
                     
@@ -586,14 +521,7 @@ class BackfillETL:
                         "is_deleted": False,
                     })
                 if rows:
-                    stmt = pg_insert(Lot).values(rows)
-                    stmt = stmt.on_conflict_do_update(
-                        index_elements=["id"],
-                        set_={c: stmt.excluded[c] for c in [
-                            "amount", "ref_lot_status_id", "dumping_flag", "last_update_at",
-                        ]},
-                    )
-                    await db.execute(stmt)
+                    await db.execute(LOT_UPSERT, rows)
                     await db.commit()
                     count += len(rows)
 
@@ -641,20 +569,10 @@ class BackfillETL:
                         })
 
                 if app_rows:
-                    stmt = pg_insert(TrdApp).values(app_rows)
-                    stmt = stmt.on_conflict_do_update(
-                        index_elements=["id"],
-                        set_={"last_update_at": stmt.excluded.last_update_at},
-                    )
-                    await db.execute(stmt)
+                    await db.execute(TRD_APP_UPSERT, app_rows)
 
                 if app_lot_rows:
-                    stmt = pg_insert(TrdAppLot).values(app_lot_rows)
-                    stmt = stmt.on_conflict_do_update(
-                        index_elements=["id"],
-                        set_={c: stmt.excluded[c] for c in ["status_id", "price", "amount"]},
-                    )
-                    await db.execute(stmt)
+                    await db.execute(TRD_APP_LOT_UPSERT, app_lot_rows)
 
                 await db.commit()
                 count += len(app_rows)
@@ -706,15 +624,7 @@ class BackfillETL:
                         "is_deleted": False,
                     })
                 if rows:
-                    stmt = pg_insert(Contract).values(rows)
-                    stmt = stmt.on_conflict_do_update(
-                        index_elements=["id"],
-                        set_={c: stmt.excluded[c] for c in [
-                            "contract_sum_wnds", "fakt_sum", "fakt_exec_date",
-                            "ref_contract_status_id", "last_update_at",
-                        ]},
-                    )
-                    await db.execute(stmt)
+                    await db.execute(CONTRACT_UPSERT, rows)
                     await db.commit()
                     count += len(rows)
 
@@ -723,6 +633,10 @@ class BackfillETL:
                     
                 if rows:
                     logger.info(f"Contracts upserted: {count}")
+
+            # Lots are loaded before contracts, so both views are current now
+            await refresh_view(db, MV_CONTRACT_BUY_IDS)
+            await refresh_view(db, MV_LINKED_LOTS)
         return count
 
     async def _load_rnu(self) -> int:
@@ -747,12 +661,7 @@ class BackfillETL:
                         "is_active": True,
                     })
                 if rows:
-                    stmt = pg_insert(Rnu).values(rows)
-                    stmt = stmt.on_conflict_do_update(
-                        index_elements=["id"],
-                        set_={c: stmt.excluded[c] for c in ["end_date", "is_active"]},
-                    )
-                    await db.execute(stmt)
+                    await db.execute(RNU_UPSERT, rows)
                     await db.commit()
                     count += len(rows)
                 
@@ -793,12 +702,7 @@ class BackfillETL:
                         "system_id": item.get("system_id"),
                     })
                 if rows:
-                    stmt = pg_insert(TreasuryPay).values(rows)
-                    stmt = stmt.on_conflict_do_update(
-                        index_elements=["id"],
-                        set_={"pay_amount": stmt.excluded.pay_amount},
-                    )
-                    await db.execute(stmt)
+                    await db.execute(TREASURY_PAY_UPSERT, rows)
                     await db.commit()
                     count += len(rows)
 
@@ -0,0 +1,119 @@
+"""
+Bulk write helpers: binary COPY into a temp staging table, then one
+INSERT ... SELECT ... ON CONFLICT merge into the target table; prebuilt
+ON CONFLICT upserts for the row-at-a-time / executemany loaders; and
+dropping / rebuilding secondary indexes around one-shot bulk loads.
+"""
+import asyncio
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import Insert, insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+
+def upsert_stmt(model, update_cols: list[str], index_elements: list[str] = ("id",)) -> Insert:
+    """
+    INSERT ... ON CONFLICT DO UPDATE for `model` without bound values.
+    Build it once at import and execute it with a list of row dicts, so it is
+    compiled once instead of per batch.
+    """
+    stmt = pg_insert(model)
+    return stmt.on_conflict_do_update(
+        index_elements=list(index_elements),
+        set_={c: stmt.excluded[c] for c in update_cols},
+    )
+
+
+async def copy_upsert(
+    session: AsyncSession,
+    table: str,
+    rows: list[tuple],
+    cols: list[str],
+    update_cols: list[str],
+    conflict: str = "id",
+    where: str | None = None,
+) -> int:
+    """
+    Upsert `rows` (tuples in `cols` order) into `table` via asyncpg COPY +
+    staging table.
+    `where` is an optional SQL filter over the staged rows (aliased `s`),
+    e.g. a semi-join that keeps only rows with a matching parent.
+    Runs inside the session's current transaction; nothing is committed here.
+    Returns the number of rows inserted or updated.
+    """
+    if not rows:
+        return 0
+
+    stage = f"{table}_stage"
+    col_list = ", ".join(cols)
+
+    # Executing through the session first makes sure its transaction is open,
+    # so the ON COMMIT DROP table lives until the caller commits. Only `cols`
+    # are staged, without constraints, so serial ids are left to the target.
+    await session.execute(text(
+        f"CREATE TEMP TABLE IF NOT EXISTS {stage} ON COMMIT DROP AS "
+        f"SELECT {col_list} FROM {table} WITH NO DATA"
+    ))
+
+    # The rest goes straight to asyncpg, in the same transaction: no
+    # SQLAlchemy statement layer or greenlet hop per call.
+    conn = await session.connection()
+    raw = (await conn.get_raw_connection()).driver_connection
+    await raw.copy_records_to_table(stage, records=rows, columns=cols)
+
+    set_clause = ", ".join(f"{c} = EXCLUDED.{c}" for c in update_cols)
+    where_clause = f"WHERE {where} " if where else ""
+    status = await raw.execute(
+        f"INSERT INTO {table} ({col_list}) SELECT {col_list} FROM {stage} s "
+        f"{where_clause}ON CONFLICT ({conflict}) DO UPDATE SET {set_clause}"
+    )
+    # Several batches can share one transaction; start the next one empty.
+    # TRUNCATE, not DELETE: deleted rows would stay behind as dead tuples
+    # that every later COPY and merge of the transaction has to scan.
+    await raw.execute(f"TRUNCATE {stage}")
+    # Command tag "INSERT 0 <rows>"
+    return int(status.rsplit(" ", 1)[1])
+
+
+# Index builds running at once when restoring indexes
+INDEX_BUILD_SLOTS = 4
+
+
+async def drop_secondary_indexes(session: AsyncSession, tables: list[str]) -> list[str]:
+    """
+    Drop the non-unique indexes of `tables` and commit; return their
+    CREATE INDEX statements for create_indexes(). Primary keys and unique
+    indexes stay: ON CONFLICT needs them.
+    """
+    result = await session.execute(text(
+        "SELECT c.relname, pg_get_indexdef(i.indexrelid) "
+        "FROM pg_index i "
+        "JOIN pg_class c ON c.oid = i.indexrelid "
+        "JOIN pg_class t ON t.oid = i.indrelid "
+        "WHERE t.relname = ANY(:tables) "
+        "AND t.relnamespace = current_schema()::regnamespace "
+        "AND NOT i.indisunique"
+    ), {"tables": tables})
+    indexes = result.all()
+    for name, _ in indexes:
+        await session.execute(text(f'DROP INDEX IF EXISTS "{name}"'))
+    await session.commit()
+    return [ddl for _, ddl in indexes]
+
+
+async def create_indexes(engine: AsyncEngine, ddls: list[str]) -> None:
+    """
+    Rebuild indexes from their CREATE INDEX statements, a few at a time, each
+    on its own connection. Plain CREATE INDEX, not CONCURRENTLY: it reads the
+    table once, and builds only take SHARE locks, which don't conflict with
+    each other; concurrent builds wait on each other's transactions and can
+    deadlock. Writes to the table wait meanwhile, so run it after the load.
+    """
+    slots = asyncio.Semaphore(INDEX_BUILD_SLOTS)
+
+    async def build(ddl: str) -> None:
+        ddl = ddl.replace("CREATE INDEX ", "CREATE INDEX IF NOT EXISTS ", 1)
+        async with slots, engine.begin() as conn:
+            await conn.execute(text(ddl))
+
+    await asyncio.gather(*(build(ddl) for ddl in ddls))
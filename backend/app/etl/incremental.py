@@ -1,9 +1,10 @@
 import logging
 from datetime import datetime, timedelta
-from sqlalchemy.dialects.postgresql import insert as pg_insert
-from sqlalchemy import update
+from sqlalchemy import insert, update
+from app.etl.bulk import upsert_stmt
 from app.etl.client import OWSClient
-from app.etl.backfill import _parse_dt, _safe_decimal
+from app.etl.views import MV_CONTRACT_BUY_IDS, MV_LINKED_LOTS, refresh_view
+from app.etl._fastcast import _parse_dt, _safe_decimal
 from app.models.procurement import (
     TrdBuy, Lot, TrdApp, TrdAppLot, Contract, Subject, Rnu,
     EtlRun, EtlCursor,
@@ -12,6 +13,21 @@ from app.core.database import AsyncSessionLocal
 
 logger = logging.getLogger(__name__)
 
+# Upserts built once at import; executed with a list of rows (executemany)
+TRD_BUY_UPSERT = upsert_stmt(TrdBuy, ["ref_buy_status_id", "total_sum", "last_update_at"])
+LOT_UPSERT = upsert_stmt(Lot, ["amount", "ref_lot_status_id", "dumping_flag", "last_update_at"])
+CONTRACT_UPSERT = upsert_stmt(Contract, [
+    "contract_sum_wnds", "fakt_sum", "fakt_exec_date", "ref_contract_status_id", "last_update_at",
+])
+SUBJECT_UPSERT = upsert_stmt(Subject, ["name_ru", "regdate", "mark_small_employer", "last_update_at"])
+ETL_CURSOR_UPSERT = upsert_stmt(EtlCursor, ["cursor_value", "updated_at"], index_elements=["source_name"])
+
+# Materialized views to refresh once the journal touched an entity type
+STALE_VIEWS = {
+    "Contract": (MV_CONTRACT_BUY_IDS, MV_LINKED_LOTS),
+    "Lots": (MV_LINKED_LOTS,),
+}
+
 ENTITY_ENDPOINT_MAP = {
     "TrdBuy": "/v3/trd-buy",
     "Lots": "/v3/lots",
@@ -33,6 +49,7 @@ class IncrementalETL:
         today = datetime.utcnow().strftime("%Y-%m-%d")
         self.date_from = date_from or yesterday
         self.date_to = date_to or today
+        self._stale_views = set()
         self.client = OWSClient()
 
     async def run(self) -> dict:
@@ -51,12 +68,19 @@ class IncrementalETL:
                     logger.error(f"Error processing journal entry {entry}: {e}")
                     summary["errors"] += 1
 
+            if self._stale_views:
+                async with AsyncSessionLocal() as db:
+                    for view in sorted(self._stale_views):
+                        await refresh_view(db, view)
+
             await self._update_cursor()
             await self._finish_run(run_id, "success", summary)
         except Exception as e:
             logger.error(f"Incremental ETL failed: {e}")
             await self._finish_run(run_id, "failed", {"error": str(e)})
             raise
+        finally:
+            await self.client.aclose()
 
         return summary
 
@@ -68,6 +92,7 @@ class IncrementalETL:
 
         if not entity_type or not entity_id:
             return
+        self._stale_views.update(STALE_VIEWS.get(entity_type, ()))
 
         if action == "D":
             await self._soft_delete(entity_type, entity_id)
@@ -134,12 +159,7 @@ class IncrementalETL:
             "last_update_at": datetime.utcnow(),
             "is_deleted": False,
         }
-        stmt = pg_insert(TrdBuy).values([row])
-        stmt = stmt.on_conflict_do_update(
-            index_elements=["id"],
-            set_={c: stmt.excluded[c] for c in ["ref_buy_status_id", "total_sum", "last_update_at"]},
-        )
-        await db.execute(stmt)
+        await db.execute(TRD_BUY_UPSERT, [row])
 
     async def _upsert_lot(self, db, item: dict):
         row = {
@@ -154,12 +174,7 @@ class IncrementalETL:
             "last_update_at": datetime.utcnow(),
             "is_deleted": False,
         }
-        stmt = pg_insert(Lot).values([row])
-        stmt = stmt.on_conflict_do_update(
-            index_elements=["id"],
-            set_={c: stmt.excluded[c] for c in ["amount", "ref_lot_status_id", "dumping_flag", "last_update_at"]},
-        )
-        await db.execute(stmt)
+        await db.execute(LOT_UPSERT, [row])
 
     async def _upsert_contract(self, db, item: dict):
         row = {
@@ -179,14 +194,7 @@ class IncrementalETL:
             "last_update_at": datetime.utcnow(),
             "is_deleted": False,
         }
-        stmt = pg_insert(Contract).values([row])
-        stmt = stmt.on_conflict_do_update(
-            index_elements=["id"],
-            set_={c: stmt.excluded[c] for c in [
-                "contract_sum_wnds", "fakt_sum", "fakt_exec_date", "ref_contract_status_id", "last_update_at"
-            ]},
-        )
-        await db.execute(stmt)
+        await db.execute(CONTRACT_UPSERT, [row])
 
     async def _upsert_subject(self, db, item: dict):
         row = {
@@ -202,39 +210,32 @@ class IncrementalETL:
             "last_update_at": datetime.utcnow(),
             "is_deleted": False,
         }
-        stmt = pg_insert(Subject).values([row])
-        stmt = stmt.on_conflict_do_update(
-            index_elements=["id"],
-            set_={c: stmt.excluded[c] for c in ["name_ru", "regdate", "mark_small_employer", "last_update_at"]},
-        )
-        await db.execute(stmt)
+        await db.execute(SUBJECT_UPSERT, [row])
 
     async def _update_cursor(self):
         async with AsyncSessionLocal() as db:
-            stmt = pg_insert(EtlCursor).values([{
+            await db.execute(ETL_CURSOR_UPSERT, [{
                 "source_name": "journal",
                 "cursor_value": self.date_to,
                 "updated_at": datetime.utcnow(),
             }])
-            stmt = stmt.on_conflict_do_update(
-                index_elements=["source_name"],
-                set_={"cursor_value": stmt.excluded.cursor_value, "updated_at": stmt.excluded.updated_at},
-            )
-            await db.execute(stmt)
             await db.commit()
 
     async def _start_run(self) -> int:
         async with AsyncSessionLocal() as db:
-            run = EtlRun(
-                run_type="incremental",
-                started_at=datetime.utcnow(),
-                status="running",
-                summary_jsonb={"date_from": self.date_from, "date_to": self.date_to},
+            # INSERT ... RETURNING id: one round-trip, no refresh SELECT
+            run_id = await db.scalar(
+                insert(EtlRun)
+                .values(
+                    run_type="incremental",
+                    started_at=datetime.utcnow(),
+                    status="running",
+                    summary_jsonb={"date_from": self.date_from, "date_to": self.date_to},
+                )
+                .returning(EtlRun.id)
             )
-            db.add(run)
             await db.commit()
-            await db.refresh(run)
-            return run.id
+            return run_id
 
     async def _finish_run(self, run_id: int, status: str, summary: dict):
         async with AsyncSessionLocal() as db:
@@ -0,0 +1,118 @@
+"""
+Paged loads as a producer/consumer pair: one task pages the OWS API into a
+bounded queue while another writes the previous pages to Postgres, so HTTP
+latency hides behind DB latency instead of adding to it.
+"""
+import asyncio
+import logging
+from typing import AsyncIterator, Awaitable, Callable
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Pages fetched ahead of the DB writer; bounds memory when the DB falls behind
+QUEUE_SIZE = 4
+_DONE = object()
+
+WriteBatch = Callable[[AsyncSession, list], Awaitable[int]]
+
+
+async def _produce(
+    pages: AsyncIterator[list],
+    queue: asyncio.Queue,
+    label: str,
+    scan_limit: int | None,
+) -> None:
+    """Drain API pages into the queue; a full queue pauses the paging."""
+    scanned = 0
+    try:
+        async for batch in pages:
+            await queue.put(batch)
+            scanned += len(batch)
+            if scan_limit and scanned >= scan_limit:
+                logger.info(f"Scanned {scanned} records, stopping {label} load.")
+                break
+    except Exception as e:
+        # Hand the failure to the consumer instead of leaving it waiting
+        await queue.put(e)
+        return
+    await queue.put(_DONE)
+
+
+async def _consume(
+    queue: asyncio.Queue,
+    write_batch: WriteBatch,
+    label: str,
+    match_limit: int | None,
+    commit_rows: int,
+    synchronous_commit: bool,
+) -> int:
+    """Write queued batches until the producer is done or the match cap is hit."""
+    count = 0
+    matched = 0
+    pending_rows = 0
+    # One session for the whole load; commit every `commit_rows` written rows
+    async with AsyncSessionLocal() as db:
+        while True:
+            batch = await queue.get()
+            if batch is _DONE:
+                break
+            if isinstance(batch, Exception):
+                raise batch
+
+            count += len(batch)  # total API records scanned
+            if not synchronous_commit and not db.in_transaction():
+                # LOCAL: scoped to this transaction, so nothing leaks to the
+                # next PgBouncer client of this server connection
+                await db.execute(text("SET LOCAL synchronous_commit = off"))
+            written = await write_batch(db, batch)
+            if written:
+                matched += written
+                pending_rows += written
+                logger.info(f"{label} upserted: {matched} (scanned: {count})")
+            if pending_rows >= commit_rows:
+                await db.commit()
+                pending_rows = 0
+
+            if match_limit and matched >= match_limit:
+                logger.info(f"Reached limit {match_limit} for {label}, stopping.")
+                break
+        await db.commit()
+    return matched
+
+
+async def run_pipeline(
+    pages: AsyncIterator[list],
+    write_batch: WriteBatch,
+    label: str,
+    scan_limit: int | None = None,
+    match_limit: int | None = None,
+    commit_rows: int = 1,
+    queue_size: int = QUEUE_SIZE,
+    synchronous_commit: bool = True,
+) -> int:
+    """
+    Feed `pages` (item batches, as yielded by OWSClient.batches_only) through
+    `write_batch`, which writes one page on the given session and returns the
+    rows written.
+    Stops early after `scan_limit` API records or `match_limit` written rows.
+    synchronous_commit=False lets commits return before their WAL is flushed:
+    a crash can lose the last commits but never corrupts, so use it only for
+    idempotent loads that are simply re-run.
+    Returns the number of rows written.
+    """
+    queue = asyncio.Queue(maxsize=queue_size)
+    producer = asyncio.create_task(_produce(pages, queue, label, scan_limit))
+    consumer = asyncio.create_task(
+        _consume(queue, write_batch, label, match_limit, commit_rows, synchronous_commit)
+    )
+    try:
+        return await consumer
+    finally:
+        # The consumer may stop on the cap while the producer is still paging
+        producer.cancel()
+        await asyncio.gather(producer, return_exceptions=True)
@@ -0,0 +1,290 @@
+"""
+Field plans of the OWS -> table loads: per table, the COPY column order,
+the columns refreshed on conflict, the shape of one API item, and a record
+builder that turns such an item into a positional tuple in that order (fed
+to copy_upsert).
+"""
+from typing import Any, Optional
+
+import msgspec
+
+from app.etl._fastcast import _parse_dt, _safe_decimal
+
+LOT_COLS = [
+    "id", "trd_buy_id", "lot_number", "name_ru", "name_kz", "amount",
+    "customer_bin", "customer_name", "dumping_flag", "union_lots_flag",
+    "ref_lot_status_id", "singl_org_sign", "is_light_industry",
+    "is_construction_work", "disable_person_id", "system_id",
+    "last_update_at", "is_deleted",
+]
+LOT_UPDATE_COLS = ["amount", "ref_lot_status_id", "dumping_flag", "last_update_at"]
+TRD_APP_COLS = [
+    "id", "buy_id", "supplier_id", "supplier_biin", "cr_fio", "mod_fio",
+    "prot_id", "prot_number", "date_apply", "system_id", "last_update_at",
+]
+TRD_APP_UPDATE_COLS = ["last_update_at"]
+TRD_APP_LOT_COLS = [
+    "id", "trd_app_id", "lot_id", "status_id", "price", "amount",
+    "discount_value", "discount_price",
+]
+TRD_APP_LOT_UPDATE_COLS = ["status_id", "price", "amount"]
+CONTRACT_COLS = [
+    "id", "trd_buy_id", "contract_number", "contract_number_sys",
+    "trd_buy_number_anno", "customer_bin", "supplier_biin", "contract_sum_wnds",
+    "sign_date", "plan_exec_date", "fakt_exec_date", "fakt_sum",
+    "ref_contract_status_id", "ref_contract_type_id", "parent_id", "root_id",
+    "supplier_legal_address", "customer_legal_address", "is_gu",
+    "exchange_rate", "system_id", "last_update_at", "is_deleted",
+]
+CONTRACT_UPDATE_COLS = [
+    "contract_sum_wnds", "fakt_sum", "fakt_exec_date",
+    "ref_contract_status_id", "last_update_at",
+]
+RNU_COLS = [
+    "id", "pid", "supplier_biin", "supplier_name_ru", "start_date",
+    "end_date", "reason", "system_id", "is_active",
+]
+RNU_UPDATE_COLS = ["end_date", "is_active"]
+TREASURY_PAY_COLS = [
+    "id", "nom_za", "contract_id", "dt_reg", "supplier", "rnn_supplier",
+    "nom_dog", "dt_dog", "item_description", "pay_amount", "pay_date",
+    "ppn", "espk", "gu", "fin_source", "index_date", "system_id",
+]
+TREASURY_PAY_UPDATE_COLS = ["pay_amount"]
+
+
+def dedupe(records: list[tuple]) -> list[tuple]:
+    """
+    Keep the last record per id (first column). Pages can repeat an item, and
+    one INSERT ... ON CONFLICT DO UPDATE must not touch the same row twice.
+    """
+    return list({r[0]: r for r in records}.values())
+
+
+# OWS item shapes, decoded straight from the response bytes by
+# OWSClient.paginate(item_type=...): no per-item dict, and keys not listed
+# here are skipped by the decoder. Values keep their JSON types (Any) and the
+# builders below cast them, so an odd value never fails the item's decode.
+# Defaults match a missing key.
+class LotItem(msgspec.Struct):
+    id: int
+    trd_buy_id: Any = None
+    buy_id: Any = None
+    lot_number: Any = None
+    name_ru: Any = None
+    name_kz: Any = None
+    amount: Any = None
+    customer_bin: Any = None
+    customer_name_ru: Any = None
+    dumping_flag: Any = False
+    union_lots_flag: Any = False
+    ref_lot_status_id: Any = None
+    singl_org_sign: Any = 0
+    is_light_industry: Any = 0
+    is_construction_work: Any = 0
+    disable_person_id: Any = 0
+    system_id: Any = None
+    index_date: Any = None
+
+
+class TrdAppLotItem(msgspec.Struct):
+    id: int
+    lot_id: Any = None
+    status_id: Any = None
+    price: Any = None
+    amount: Any = None
+    discount_value: Any = None
+    discount_price: Any = None
+
+
+class TrdAppItem(msgspec.Struct):
+    id: int
+    buy_id: Any = None
+    supplier_id: Any = None
+    supplier_bin_iin: Any = None
+    cr_fio: Any = None
+    mod_fio: Any = None
+    prot_id: Any = None
+    prot_number: Any = ""
+    date_apply: Any = None
+    system_id: Any = None
+    index_date: Any = None
+    app_lots: Optional[list[TrdAppLotItem]] = None
+
+
+class ContractItem(msgspec.Struct):
+    id: int
+    trd_buy_id: Any = None
+    contract_number: Any = None
+    contract_number_sys: Any = None
+    trd_buy_number_anno: Any = None
+    customer_bin: Any = None
+    supplier_biin: Any = None
+    contract_sum_wnds: Any = None
+    sign_date: Any = None
+    crdate: Any = None
+    plan_exec_date: Any = None
+    fakt_exec_date: Any = None
+    fakt_sum: Any = None
+    ref_contract_status_id: Any = None
+    ref_contract_type_id: Any = None
+    parent_id: Any = None
+    root_id: Any = None
+    supplier_legal_address: Any = None
+    customer_legal_address: Any = None
+    is_gu: Any = 0
+    exchange_rate: Any = None
+    system_id: Any = None
+    last_update_date: Any = None
+
+
+class RnuItem(msgspec.Struct):
+    id: int
+    pid: Any = None
+    biin: Any = None
+    iin: Any = None
+    name_ru: Any = None
+    start_date: Any = None
+    end_date: Any = None
+    reason_ru: Any = None
+    reason: Any = None
+    system_id: Any = 3
+
+
+class TreasuryPayItem(msgspec.Struct):
+    id: int
+    nom_za: Any = None
+    contract_id: Any = None
+    dt_reg: Any = None
+    supplier: Any = None
+    rnn_supplier: Any = None
+    nom_dog: Any = None
+    dt_dog: Any = None
+    item_description: Any = None
+    pay_amount: Any = None
+    pay_date: Any = None
+    ppn: Any = None
+    espk: Any = None
+    gu: Any = None
+    fin_source: Any = None
+    index_date: Any = None
+    system_id: Any = None
+
+
+# One call per API item; the tuple is built in place from attributes
+def lot_record(item: LotItem) -> tuple:
+    return (
+        item.id,
+        item.trd_buy_id or item.buy_id,
+        item.lot_number or str(item.id),
+        item.name_ru,
+        item.name_kz,
+        _safe_decimal(item.amount),
+        item.customer_bin,
+        item.customer_name_ru,
+        bool(item.dumping_flag),
+        bool(item.union_lots_flag),
+        item.ref_lot_status_id,
+        item.singl_org_sign,
+        item.is_light_industry,
+        item.is_construction_work,
+        item.disable_person_id,
+        item.system_id,
+        _parse_dt(item.index_date),
+        False,
+    )
+
+
+def trd_app_record(item: TrdAppItem) -> tuple:
+    # Usually a str already; only numbers need converting
+    pn = item.prot_number
+    return (
+        item.id,
+        item.buy_id,
+        item.supplier_id,
+        item.supplier_bin_iin,
+        item.cr_fio,
+        item.mod_fio,
+        item.prot_id,
+        pn if type(pn) is str else "" if pn is None else str(pn),
+        _parse_dt(item.date_apply),
+        item.system_id,
+        _parse_dt(item.index_date),
+    )
+
+
+def trd_app_lot_record(app_id: int, al: TrdAppLotItem) -> tuple:
+    return (
+        al.id,
+        app_id,
+        al.lot_id,
+        al.status_id,
+        _safe_decimal(al.price),
+        _safe_decimal(al.amount),
+        al.discount_value,
+        _safe_decimal(al.discount_price),
+    )
+
+
+def contract_record(item: ContractItem) -> tuple:
+    return (
+        item.id,
+        item.trd_buy_id,
+        item.contract_number,
+        item.contract_number_sys,
+        item.trd_buy_number_anno,
+        item.customer_bin,
+        item.supplier_biin,
+        _safe_decimal(item.contract_sum_wnds),
+        _parse_dt(item.sign_date or item.crdate),
+        _parse_dt(item.plan_exec_date),
+        _parse_dt(item.fakt_exec_date),
+        _safe_decimal(item.fakt_sum),
+        item.ref_contract_status_id,
+        item.ref_contract_type_id,
+        item.parent_id,
+        item.root_id,
+        item.supplier_legal_address,
+        item.customer_legal_address,
+        item.is_gu,
+        item.exchange_rate,
+        item.system_id,
+        _parse_dt(item.last_update_date),
+        False,
+    )
+
+
+def rnu_record(item: RnuItem) -> tuple:
+    return (
+        item.id,
+        item.pid,
+        item.biin or item.iin,
+        item.name_ru,
+        _parse_dt(item.start_date),
+        _parse_dt(item.end_date),
+        item.reason_ru or item.reason,
+        item.system_id,
+        True,
+    )
+
+
+def treasury_pay_record(item: TreasuryPayItem) -> tuple:
+    return (
+        item.id,
+        item.nom_za,
+        item.contract_id,
+        _parse_dt(item.dt_reg),
+        item.supplier,
+        item.rnn_supplier,
+        item.nom_dog,
+        _parse_dt(item.dt_dog),
+        item.item_description,
+        _safe_decimal(item.pay_amount),
+        _parse_dt(item.pay_date),
+        item.ppn,
+        item.espk,
+        item.gu,
+        item.fin_source,
+        _parse_dt(item.index_date),
+        item.system_id,
+    )
@@ -0,0 +1,19 @@
+"""
+Materialized views maintained by the ETL (created in Alembic migrations).
+"""
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# DISTINCT trd_buy_id of live contracts; used to pick lots/trd_app worth loading
+MV_CONTRACT_BUY_IDS = "mv_contract_buy_ids"
+# Live lots whose tender has a live contract; the FeatureEngine work list
+MV_LINKED_LOTS = "mv_linked_lots"
+
+
+async def refresh_view(session: AsyncSession, name: str) -> None:
+    """
+    Refresh a materialized view without blocking readers and commit.
+    CONCURRENTLY needs the view's unique index and an already populated view.
+    """
+    await session.execute(text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {name}"))
+    await session.commit()
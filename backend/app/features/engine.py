@@ -1,17 +1,21 @@
 """
 Feature Engine: orchestrates all 16 indicators and computes RiskScore.
 """
+import asyncio
+import heapq
+import json
 import logging
 import yaml
 import os
-from datetime import datetime
+from operator import itemgetter
+from datetime import datetime, timezone
 from typing import Optional
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from sqlalchemy import select, func
-from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 from app.core.database import AsyncSessionLocal
-from app.models.procurement import Lot, Contract, TrdBuy, RiskFlag, RiskScore
+from app.etl.bulk import copy_upsert
+from app.models.procurement import Lot, Contract, TrdBuy
 from app.features import indicators as ind
 
 logger = logging.getLogger(__name__)
@@ -23,14 +27,36 @@ with open(_WEIGHTS_PATH) as f:
 
 WEIGHTS = {k: v["weight"] for k, v in _CONFIG["indicators"].items()}
 MAX_SCORE = sum(WEIGHTS.values())
+_DESCRIPTIONS = {k: v.get("description", "") for k, v in _CONFIG["indicators"].items()}
+# Bit of each indicator in RiskScore.flags_mask (a signed BIGINT: at most 63 bits)
+FLAG_BITS = {k: v["bit"] for k, v in _CONFIG["indicators"].items()}
 THRESHOLDS = _CONFIG["thresholds"]
 
+# Lots scored per session; flags and scores are upserted once per batch
+BATCH_SIZE = 1000
+# Indicator groups of one lot run on separate sessions; never hold more than this
+MAX_CONCURRENT_READS = 8
+
+# COPY column order of the flag/score records; the rest is refreshed on conflict
+FLAG_COLS = [
+    "entity_type", "entity_id", "indicator_code",
+    "flag_bool", "value_numeric", "evidence_jsonb", "computed_at",
+]
+SCORE_COLS = [
+    "entity_type", "entity_id", "score", "level", "top_reasons_jsonb", "flags_mask", "computed_at",
+]
+
 
 def _normalize_score(raw: float) -> float:
     """Normalize raw weighted sum to 0-100."""
     return round(min(100.0, (raw / MAX_SCORE) * 100), 1)
 
 
+def _utcnow() -> datetime:
+    """Naive UTC timestamp, matching the DateTime columns."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
 def _get_level(score: float) -> str:
     if score <= THRESHOLDS["low_max"]:
         return "LOW"
@@ -44,11 +70,18 @@ class FeatureEngine:
     Computes risk flags and scores for lots, tenders, suppliers, and customers.
     """
 
-    async def run(self, entity_ids: list = None) -> dict:
+    def __init__(self):
+        # Caps concurrent indicator sessions so a run can't exhaust the pool
+        self._read_slots = asyncio.Semaphore(MAX_CONCURRENT_READS)
+
+    async def run(
+        self, entity_ids: list = None, session_factory: async_sessionmaker = None
+    ) -> dict:
         """Recompute features for all lots (or a specific list)."""
         summary = {"lots_processed": 0, "errors": 0}
+        session_factory = session_factory or AsyncSessionLocal
 
-        async with AsyncSessionLocal() as db:
+        async with session_factory() as db:
             # Get all lot IDs to process
             if entity_ids:
                 lot_ids = entity_ids
@@ -58,141 +91,200 @@ class FeatureEngine:
                 )
                 lot_ids = [r[0] for r in result.all()]
 
-        for lot_id in lot_ids:
-            try:
-                await self.compute_lot_score(lot_id)
-                summary["lots_processed"] += 1
-            except Exception as e:
-                logger.error(f"Error computing score for lot {lot_id}: {e}")
-                summary["errors"] += 1
+        # A lot listed twice would hit the same RiskScore row twice in one upsert
+        lot_ids = list(dict.fromkeys(lot_ids))
+
+        for start in range(0, len(lot_ids), BATCH_SIZE):
+            now = _utcnow()
+            score_rows, flag_records = [], []
+            processed = 0
+            # One transaction (one commit) per batch; a savepoint per lot keeps a
+            # single failing lot from rolling back the rest of the batch.
+            async with session_factory() as db, db.begin():
+                for lot_id in lot_ids[start:start + BATCH_SIZE]:
+                    try:
+                        async with db.begin_nested():
+                            computed = await self._compute_lot_score(
+                                db, lot_id, now, session_factory
+                            )
+                        if computed:
+                            score_rows.append(computed[0])
+                            flag_records.extend(computed[1])
+                        processed += 1
+                    except Exception as e:
+                        logger.error(f"Error computing score for lot {lot_id}: {e}")
+                        summary["errors"] += 1
+
+                # A failed write loses this batch's results only: its lots
+                # count as errors and the next batch still runs.
+                try:
+                    async with db.begin_nested():
+                        await _persist(db, score_rows, flag_records)
+                    summary["lots_processed"] += processed
+                except Exception as e:
+                    logger.error(f"Error persisting batch from lot {lot_ids[start]}: {e}")
+                    summary["errors"] += processed
 
         return summary
 
-    async def compute_lot_score(self, lot_id: int) -> dict:
+    async def compute_lot_score(
+        self, lot_id: int, db: Optional[AsyncSession] = None, now: Optional[datetime] = None
+    ) -> dict:
         """Compute full risk score for a single lot."""
+        now = now or _utcnow()
+        if db is not None:
+            return await self._score_and_persist(db, lot_id, now)
         async with AsyncSessionLocal() as db:
-            # Get lot info
-            lot_result = await db.execute(
-                select(Lot).where(Lot.id == lot_id)
-            )
-            lot = lot_result.scalar_one_or_none()
-            if not lot:
-                return {}
-
-            # Get associated contract
-            contract_result = await db.execute(
-                select(Contract).where(
-                    Contract.trd_buy_id == lot.trd_buy_id,
-                    Contract.is_deleted == False,
-                ).limit(1)
-            )
-            contract = contract_result.scalar_one_or_none()
-
-            flags = {}
-
-            # ── Lot-level indicators ──────────────────────────────────────────
-            flags["DUMPING_FLAG"] = await ind.check_dumping_flag(db, lot_id)
-
-            # ── Tender-level indicators ───────────────────────────────────────
-            if lot.trd_buy_id:
-                flags["SHORT_DEADLINE"] = await ind.check_short_deadline(db, lot.trd_buy_id)
-                flags["FEW_BIDS"] = await ind.check_few_bids(db, lot.trd_buy_id)
-                flags["LOT_SPLITTING"] = await ind.check_lot_splitting(db, lot.trd_buy_id)
-                flags["LAST_MINUTE_CHANGES"] = await ind.check_last_minute_changes(db, lot.trd_buy_id)
-                flags["COMMON_REQUISITES"] = await ind.check_common_requisites(db, lot.trd_buy_id)
-
-            # ── Customer-level indicators ─────────────────────────────────────
-            if lot.customer_bin and contract and contract.supplier_biin:
-                flags["RECURRING_WINNER"] = await ind.check_recurring_winner(
-                    db, lot.customer_bin, contract.supplier_biin
-                )
-                flags["CAROUSEL_PATTERN"] = await ind.check_carousel_pattern(db, lot.customer_bin)
+            return await self._score_and_persist(db, lot_id, now)
 
-            # ── Supplier-level indicators ─────────────────────────────────────
-            if contract and contract.supplier_biin:
-                flags["SUPPLIER_CONCENTRATION"] = await ind.check_supplier_concentration(
-                    db, contract.supplier_biin
-                )
-                flags["RNU_FLAG"] = await ind.check_rnu_flag(db, contract.supplier_biin)
-                flags["HIGH_WIN_RATE_FEW_BIDS"] = await ind.check_high_win_rate_few_bids(
-                    db, contract.supplier_biin
-                )
-                flags["NEW_COMPANY_BIG_CONTRACT"] = await ind.check_new_company_big_contract(
-                    db, contract.supplier_biin, float(contract.contract_sum_wnds or 0)
-                )
+    async def _score_and_persist(self, db: AsyncSession, lot_id: int, now: datetime) -> dict:
+        computed = await self._compute_lot_score(db, lot_id, now, AsyncSessionLocal)
+        if not computed:
+            return {}
+        score_row, flag_records = computed
+        await _persist(db, [score_row], flag_records)
+        await db.commit()
+        return {
+            "lot_id": lot_id,
+            "score": score_row["score"],
+            "level": score_row["level"],
+            "flags_triggered": len(score_row["top_reasons_jsonb"]),
+        }
+
+    async def _run_group(self, session_factory: async_sessionmaker, checks: list) -> dict:
+        """Run one group of indicator checks sequentially on its own session."""
+        async with self._read_slots:
+            async with session_factory() as db:
+                return {code: await check(db, *args) for code, check, args in checks}
+
+    async def _compute_lot_score(
+        self, db: AsyncSession, lot_id: int, now: datetime, session_factory: async_sessionmaker
+    ) -> Optional[tuple[dict, list[tuple]]]:
+        """Compute a lot's flags; return its score row and flag records for the caller to persist."""
+        # Get lot info
+        lot_result = await db.execute(
+            select(Lot.trd_buy_id, Lot.customer_bin, Lot.dumping_flag, Lot.amount)
+            .where(Lot.id == lot_id)
+        )
+        lot = lot_result.first()
+        if not lot:
+            return None
+
+        # Get associated contract
+        contract_result = await db.execute(
+            select(Contract.id, Contract.supplier_biin, Contract.contract_sum_wnds).where(
+                Contract.trd_buy_id == lot.trd_buy_id,
+                Contract.is_deleted == False,
+            ).limit(1)
+        )
+        contract = contract_result.first()
+
+        flags = {}
+
+        # ── Lot-level indicators ──────────────────────────────────────────
+        flags["DUMPING_FLAG"] = ind.dumping_flag_result(lot_id, lot.dumping_flag, lot.amount)
+
+        # Indicator groups are independent of each other: each group runs on
+        # its own pooled session so their queries overlap on the wire.
+        groups = []
+
+        # ── Tender-level indicators ───────────────────────────────────────
+        if lot.trd_buy_id:
+            groups.append([
+                ("SHORT_DEADLINE", ind.check_short_deadline, (lot.trd_buy_id,)),
+                ("FEW_BIDS", ind.check_few_bids, (lot.trd_buy_id,)),
+                ("LOT_SPLITTING", ind.check_lot_splitting, (lot.trd_buy_id,)),
+                ("LAST_MINUTE_CHANGES", ind.check_last_minute_changes, (lot.trd_buy_id,)),
+                ("COMMON_REQUISITES", ind.check_common_requisites, (lot.trd_buy_id,)),
+            ])
+
+        # ── Customer-level indicators ─────────────────────────────────────
+        if lot.customer_bin and contract and contract.supplier_biin:
+            groups.append([
+                ("RECURRING_WINNER", ind.check_recurring_winner, (lot.customer_bin, contract.supplier_biin)),
+                ("CAROUSEL_PATTERN", ind.check_carousel_pattern, (lot.customer_bin,)),
+            ])
+
+        # ── Supplier-level indicators ─────────────────────────────────────
+        if contract and contract.supplier_biin:
+            groups.append([
+                ("SUPPLIER_CONCENTRATION", ind.check_supplier_concentration, (contract.supplier_biin,)),
+                ("RNU_FLAG", ind.check_rnu_flag, (contract.supplier_biin,)),
+                ("HIGH_WIN_RATE_FEW_BIDS", ind.check_high_win_rate_few_bids, (contract.supplier_biin,)),
+                ("NEW_COMPANY_BIG_CONTRACT", ind.check_new_company_big_contract,
+                 (contract.supplier_biin, float(contract.contract_sum_wnds or 0))),
+            ])
+
+        # ── Contract-level indicators ─────────────────────────────────────
+        if contract:
+            groups.append([
+                ("ADDENDUM_VALUE_INCREASE", ind.check_addendum_value_increase, (contract.id,)),
+                ("WIN_MIN_THEN_ADDENDUM", ind.check_win_min_then_addendum, (contract.id,)),
+                ("WEIRD_EXECUTION_TIME", ind.check_weird_execution_time, (contract.id,)),
+                ("PAYMENT_WITHOUT_ACT", ind.check_payment_without_act, (contract.id,)),
+            ])
+
+        # gather() keeps group order, so flags stay in the same order as before
+        for group_flags in await asyncio.gather(
+            *(self._run_group(session_factory, group) for group in groups)
+        ):
+            flags.update(group_flags)
+
+        # ── Score + flag rows in a single pass over the results ───────────
+        entity_id = str(lot_id)
+        raw_score = 0
+        flags_mask = 0
+        triggered = []  # (code, weight, evidence) of flags that fired
+        flag_records = []  # in FLAG_COLS order
+        for code, result in flags.items():
+            flag = bool(result.get("flag"))
+            evidence = result.get("evidence", {})
+            if flag:
+                weight = WEIGHTS.get(code, 0)
+                raw_score += weight
+                flags_mask |= 1 << FLAG_BITS[code]
+                triggered.append((code, weight, evidence))
+            flag_records.append((
+                "lot", entity_id, code, flag, result.get("value"), json.dumps(evidence), now,
+            ))
+
+        score = _normalize_score(raw_score)
+        level = _get_level(score)
+
+        # Top 3 reasons (highest weight flags that are True)
+        top_reasons = [
+            {
+                "code": code,
+                "weight": weight,
+                "evidence": evidence,
+                "description": _DESCRIPTIONS.get(code, ""),
+            }
+            for code, weight, evidence in heapq.nlargest(3, triggered, key=itemgetter(1))
+        ]
+
+        return {
+            "entity_type": "lot",
+            "entity_id": entity_id,
+            "score": score,
+            "level": level,
+            "top_reasons_jsonb": top_reasons,
+            "flags_mask": flags_mask,
+            "computed_at": now,
+        }, flag_records
 
-            # ── Contract-level indicators ─────────────────────────────────────
-            if contract:
-                flags["ADDENDUM_VALUE_INCREASE"] = await ind.check_addendum_value_increase(
-                    db, contract.id
-                )
-                flags["WIN_MIN_THEN_ADDENDUM"] = await ind.check_win_min_then_addendum(
-                    db, contract.id
-                )
-                flags["WEIRD_EXECUTION_TIME"] = await ind.check_weird_execution_time(
-                    db, contract.id
-                )
-                flags["PAYMENT_WITHOUT_ACT"] = await ind.check_payment_without_act(
-                    db, contract.id
-                )
 
-            # ── Compute score ─────────────────────────────────────────────────
-            raw_score = sum(
-                WEIGHTS.get(code, 0) * (1 if result.get("flag") else 0)
-                for code, result in flags.items()
-            )
-            score = _normalize_score(raw_score)
-            level = _get_level(score)
-
-            # Top 3 reasons (highest weight flags that are True)
-            top_reasons = sorted(
-                [
-                    {
-                        "code": code,
-                        "weight": WEIGHTS.get(code, 0),
-                        "evidence": result.get("evidence", {}),
-                        "description": _CONFIG["indicators"].get(code, {}).get("description", ""),
-                    }
-                    for code, result in flags.items()
-                    if result.get("flag")
-                ],
-                key=lambda x: x["weight"],
-                reverse=True,
-            )[:3]
-
-            # ── Persist flags ─────────────────────────────────────────────────
-            now = datetime.utcnow()
-            flag_rows = [
-                {
-                    "entity_type": "lot",
-                    "entity_id": str(lot_id),
-                    "indicator_code": code,
-                    "flag_bool": result.get("flag", False),
-                    "value_numeric": result.get("value"),
-                    "evidence_jsonb": result.get("evidence", {}),
-                    "computed_at": now,
-                }
-                for code, result in flags.items()
-            ]
-            if flag_rows:
-                stmt = pg_insert(RiskFlag).values(flag_rows)
-                stmt = stmt.on_conflict_do_nothing()
-                await db.execute(stmt)
-
-            # ── Persist score ─────────────────────────────────────────────────
-            score_stmt = pg_insert(RiskScore).values([{
-                "entity_type": "lot",
-                "entity_id": str(lot_id),
-                "score": score,
-                "level": level,
-                "top_reasons_jsonb": top_reasons,
-                "computed_at": now,
-            }])
-            score_stmt = score_stmt.on_conflict_do_update(
-                index_elements=["entity_type", "entity_id"],
-                set_={"score": score, "level": level, "top_reasons_jsonb": top_reasons, "computed_at": now},
-            )
-            await db.execute(score_stmt)
-            await db.commit()
-
-            return {"lot_id": lot_id, "score": score, "level": level, "flags_triggered": len(top_reasons)}
+async def _persist(db: AsyncSession, score_rows: list[dict], flag_records: list[tuple]) -> None:
+    """Upsert a batch of RiskFlag records and RiskScore rows via COPY + staging merge."""
+    await copy_upsert(
+        db, "risk_flags", flag_records, FLAG_COLS, FLAG_COLS[3:],
+        conflict="entity_type, entity_id, indicator_code",
+    )
+    score_records = [
+        (r["entity_type"], r["entity_id"], r["score"], r["level"],
+         json.dumps(r["top_reasons_jsonb"]), r["flags_mask"], r["computed_at"])
+        for r in score_rows
+    ]
+    await copy_upsert(
+        db, "risk_scores", score_records, SCORE_COLS, SCORE_COLS[2:],
+        conflict="entity_type, entity_id",
+    )
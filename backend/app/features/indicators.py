@@ -6,7 +6,7 @@ import logging
 from datetime import datetime, timedelta
 from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_, or_, text
+from sqlalchemy import select, func, and_, or_, text, literal, union_all
 
 from app.models.procurement import (
     TrdBuy, Lot, TrdApp, TrdAppLot, Contract, Subject, Rnu, TreasuryPay,
@@ -61,23 +61,23 @@ async def check_few_bids(db: AsyncSession, trd_buy_id: int) -> dict:
 async def check_lot_splitting(db: AsyncSession, trd_buy_id: int) -> dict:
     """Разбивка крупной закупки на много мелких лотов."""
     result = await db.execute(
-        select(func.count(Lot.id), func.sum(Lot.amount), func.avg(Lot.amount))
+        select(func.count(Lot.id), func.sum(Lot.amount_cents), func.avg(Lot.amount_cents))
         .where(Lot.trd_buy_id == trd_buy_id, Lot.is_deleted == False)
     )
     row = result.first()
     lot_count = row[0] or 0
-    total_sum = float(row[1] or 0)
-    avg_amount = float(row[2] or 0)
+    total_cents = int(row[1] or 0)
+    avg_cents = float(row[2] or 0)
 
     # Flag: many lots (>5) with small individual amounts but large total
-    flag = lot_count > 5 and avg_amount < 5_000_000 and total_sum > 10_000_000
+    flag = lot_count > 5 and avg_cents < 500_000_000 and total_cents > 1_000_000_000
     return {
         "flag": flag,
         "value": float(lot_count),
         "evidence": {
             "lot_count": lot_count,
-            "total_sum": total_sum,
-            "avg_lot_amount": avg_amount,
+            "total_sum": total_cents / 100,
+            "avg_lot_amount": avg_cents / 100,
         },
     }
 
@@ -93,8 +93,8 @@ async def check_recurring_winner(db: AsyncSession, customer_bin: str, supplier_b
         )
     )
     total = total_result.scalar() or 0
-    if total == 0:
-        return {"flag": False, "value": 0.0, "evidence": {}}
+    if total < 5:
+        return {"flag": False, "value": 0.0, "evidence": {"total_contracts": total}}
 
     supplier_result = await db.execute(
         select(func.count(Contract.id)).where(
@@ -105,7 +105,7 @@ async def check_recurring_winner(db: AsyncSession, customer_bin: str, supplier_b
     )
     supplier_count = supplier_result.scalar() or 0
     win_rate = supplier_count / total
-    flag = win_rate > 0.70 and total >= 5
+    flag = win_rate > 0.70
 
     return {
         "flag": flag,
@@ -133,7 +133,7 @@ async def check_supplier_concentration(db: AsyncSession, supplier_biin: str) ->
     )
     total = total_result.scalar() or 0
     if total < 5:
-        return {"flag": False, "value": 0.0, "evidence": {}}
+        return {"flag": False, "value": 0.0, "evidence": {"total_contracts": total}}
 
     top_result = await db.execute(
         select(Contract.customer_bin, func.count(Contract.id).label("cnt"))
@@ -167,7 +167,7 @@ async def check_supplier_concentration(db: AsyncSession, supplier_biin: str) ->
 async def check_addendum_value_increase(db: AsyncSession, contract_id: int) -> dict:
     """Допсоглашение увеличило сумму договора >20%."""
     result = await db.execute(
-        select(Contract.contract_sum_wnds, Contract.root_id, Contract.parent_id)
+        select(Contract.contract_sum_wnds_cents, Contract.root_id, Contract.parent_id)
         .where(Contract.id == contract_id)
     )
     row = result.first()
@@ -176,13 +176,15 @@ async def check_addendum_value_increase(db: AsyncSession, contract_id: int) -> d
 
     # Get root contract
     root_result = await db.execute(
-        select(Contract.contract_sum_wnds).where(Contract.id == row.root_id)
+        select(Contract.contract_sum_wnds_cents).where(Contract.id == row.root_id)
     )
     root = root_result.first()
-    if not root or not root.contract_sum_wnds or not row.contract_sum_wnds:
+    if not root or not root.contract_sum_wnds_cents or not row.contract_sum_wnds_cents:
         return {"flag": False, "value": None, "evidence": {}}
 
-    increase_pct = (float(row.contract_sum_wnds) - float(root.contract_sum_wnds)) / float(root.contract_sum_wnds)
+    original_cents = root.contract_sum_wnds_cents
+    current_cents = row.contract_sum_wnds_cents
+    increase_pct = (current_cents - original_cents) / original_cents
     flag = increase_pct > 0.20
 
     return {
@@ -190,8 +192,8 @@ async def check_addendum_value_increase(db: AsyncSession, contract_id: int) -> d
         "value": round(increase_pct * 100, 1),
         "evidence": {
             "root_contract_id": row.root_id,
-            "original_sum": float(root.contract_sum_wnds),
-            "current_sum": float(row.contract_sum_wnds),
+            "original_sum": original_cents / 100,
+            "current_sum": current_cents / 100,
             "increase_pct": round(increase_pct * 100, 1),
             "threshold_pct": 20,
         },
@@ -203,15 +205,15 @@ async def check_addendum_value_increase(db: AsyncSession, contract_id: int) -> d
 async def check_win_min_then_addendum(db: AsyncSession, contract_id: int) -> dict:
     """Выигрыш по минимальной цене, затем немедленное допсоглашение."""
     result = await db.execute(
-        select(Contract).where(Contract.id == contract_id)
+        select(Contract.sign_date, Contract.root_id).where(Contract.id == contract_id)
     )
-    contract = result.scalar_one_or_none()
+    contract = result.first()
     if not contract or not contract.root_id:
         return {"flag": False, "value": None, "evidence": {}}
 
     # Find addendum (child contract)
     addendum_result = await db.execute(
-        select(Contract.sign_date, Contract.contract_sum_wnds)
+        select(Contract.sign_date, Contract.contract_sum_wnds_cents)
         .where(Contract.parent_id == contract_id)
         .order_by(Contract.sign_date)
         .limit(1)
@@ -230,7 +232,7 @@ async def check_win_min_then_addendum(db: AsyncSession, contract_id: int) -> dic
             "contract_sign_date": str(contract.sign_date),
             "addendum_sign_date": str(addendum.sign_date),
             "days_to_addendum": days_to_addendum,
-            "addendum_sum": float(addendum.contract_sum_wnds or 0),
+            "addendum_sum": (addendum.contract_sum_wnds_cents or 0) / 100,
         },
     }
 
@@ -296,10 +298,15 @@ async def check_dumping_flag(db: AsyncSession, lot_id: int) -> dict:
     if not row:
         return {"flag": False, "value": None, "evidence": {}}
 
+    return dumping_flag_result(lot_id, row.dumping_flag, row.amount)
+
+
+def dumping_flag_result(lot_id: int, dumping_flag: Optional[bool], amount) -> dict:
+    """DUMPING_FLAG from lot columns the caller already has in hand."""
     return {
-        "flag": bool(row.dumping_flag),
-        "value": 1.0 if row.dumping_flag else 0.0,
-        "evidence": {"lot_id": lot_id, "dumping_flag": row.dumping_flag, "lot_amount": float(row.amount or 0)},
+        "flag": bool(dumping_flag),
+        "value": 1.0 if dumping_flag else 0.0,
+        "evidence": {"lot_id": lot_id, "dumping_flag": dumping_flag, "lot_amount": float(amount or 0)},
     }
 
 
@@ -341,24 +348,24 @@ async def check_new_company_big_contract(
 
 # ─── 12. PAYMENT_WITHOUT_ACT ─────────────────────────────────────────────────
 
+_ACT_COUNT_SQL = text("SELECT COUNT(*) FROM acts WHERE contract_id = :cid")
+
+
 async def check_payment_without_act(db: AsyncSession, contract_id: int) -> dict:
     """Казначейский платёж без акта выполнения работ."""
     pay_result = await db.execute(
-        select(func.count(TreasuryPay.id), func.sum(TreasuryPay.pay_amount))
+        select(func.count(TreasuryPay.id), func.sum(TreasuryPay.pay_amount_cents))
         .where(TreasuryPay.contract_id == contract_id)
     )
     pay_row = pay_result.first()
     pay_count = pay_row[0] or 0
-    pay_sum = float(pay_row[1] or 0)
+    pay_sum = int(pay_row[1] or 0) / 100
 
     if pay_count == 0:
         return {"flag": False, "value": 0.0, "evidence": {}}
 
     # Check if acts exist for this contract
-    act_result = await db.execute(
-        text("SELECT COUNT(*) FROM acts WHERE contract_id = :cid"),
-        {"cid": contract_id}
-    )
+    act_result = await db.execute(_ACT_COUNT_SQL, {"cid": contract_id})
     act_count = act_result.scalar() or 0
 
     flag = pay_count > 0 and act_count == 0
@@ -377,38 +384,40 @@ async def check_payment_without_act(db: AsyncSession, contract_id: int) -> dict:
 
 # ─── 13. HIGH_WIN_RATE_FEW_BIDS ──────────────────────────────────────────────
 
+_WIN_RATE_SQL = text("""
+    WITH p AS (
+        SELECT DISTINCT buy_id FROM trd_app
+        WHERE supplier_biin = :s AND buy_id IS NOT NULL
+    ),
+    w AS (
+        SELECT count(DISTINCT trd_buy_id) AS won
+        FROM contract
+        WHERE supplier_biin = :s AND is_deleted = false
+    ),
+    b AS (
+        SELECT avg(cnt) AS avg_bids
+        FROM (
+            SELECT count(*) AS cnt FROM trd_app
+            WHERE buy_id IN (SELECT buy_id FROM p)
+            GROUP BY buy_id
+        ) x
+    )
+    SELECT (SELECT count(*) FROM p) AS participated, w.won, b.avg_bids
+    FROM w, b
+""")
+
+
 async def check_high_win_rate_few_bids(db: AsyncSession, supplier_biin: str) -> dict:
     """Win-rate >90% при среднем числе заявок <3 в тендере."""
-    # Total tenders where supplier participated
-    participated = await db.execute(
-        select(func.count(func.distinct(TrdApp.buy_id)))
-        .where(TrdApp.supplier_biin == supplier_biin)
-    )
-    total_participated = participated.scalar() or 0
+    result = await db.execute(_WIN_RATE_SQL, {"s": supplier_biin})
+    row = result.first()
+    total_participated = row.participated or 0
     if total_participated < 5:
         return {"flag": False, "value": 0.0, "evidence": {}}
 
-    # Tenders where supplier won
-    won = await db.execute(
-        select(func.count(func.distinct(Contract.trd_buy_id)))
-        .where(Contract.supplier_biin == supplier_biin, Contract.is_deleted == False)
-    )
-    total_won = won.scalar() or 0
-    win_rate = total_won / total_participated if total_participated > 0 else 0
-
-    # Average bids per tender
-    avg_bids_result = await db.execute(
-        select(func.avg(text("bid_count")))
-        .select_from(
-            select(TrdApp.buy_id, func.count(TrdApp.id).label("bid_count"))
-            .where(TrdApp.buy_id.in_(
-                select(TrdApp.buy_id).where(TrdApp.supplier_biin == supplier_biin)
-            ))
-            .group_by(TrdApp.buy_id)
-            .subquery()
-        )
-    )
-    avg_bids = float(avg_bids_result.scalar() or 0)
+    total_won = row.won or 0
+    win_rate = total_won / total_participated
+    avg_bids = float(row.avg_bids or 0)
     flag = win_rate > 0.90 and avg_bids < 3
 
     return {
@@ -429,18 +438,17 @@ async def check_high_win_rate_few_bids(db: AsyncSession, supplier_biin: str) ->
 async def check_carousel_pattern(db: AsyncSession, customer_bin: str) -> dict:
     """Паттерн чередования победителей А→В→С→А у одного заказчика."""
     result = await db.execute(
-        select(Contract.supplier_biin, Contract.sign_date)
+        select(Contract.supplier_biin)
         .where(Contract.customer_bin == customer_bin, Contract.is_deleted == False)
         .order_by(Contract.sign_date)
         .limit(50)
     )
-    rows = result.all()
-    if len(rows) < 6:
+    suppliers = list(result.scalars())
+    if len(suppliers) < 6:
         return {"flag": False, "value": 0.0, "evidence": {}}
 
-    suppliers = [r.supplier_biin for r in rows]
     # Detect cycling: check if pattern repeats (A,B,C,A,B,C or similar)
-    unique_suppliers = list(dict.fromkeys(suppliers))  # preserve order
+    unique_suppliers = set(suppliers)
     if len(unique_suppliers) < 2:
         return {"flag": False, "value": 0.0, "evidence": {}}
 
@@ -454,7 +462,7 @@ async def check_carousel_pattern(db: AsyncSession, customer_bin: str) -> dict:
         else:
             seen.add(s)
 
-    flag = rotations >= 2 and len(unique_suppliers) >= 2
+    flag = rotations >= 2
 
     return {
         "flag": flag,
@@ -506,18 +514,25 @@ async def check_common_requisites(db: AsyncSession, trd_buy_id: int) -> dict:
     if len(biins) < 2:
         return {"flag": False, "value": 0.0, "evidence": {}}
 
-    # Get their contact info
-    subjects_result = await db.execute(
-        select(Subject.bin, Subject.iin, Subject.phone, Subject.email)
-        .where(or_(Subject.bin.in_(biins), Subject.iin.in_(biins)))
+    # Only phones/emails shared by more than one bidder come back from the DB
+    bidder = or_(Subject.bin.in_(biins), Subject.iin.in_(biins))
+    shared_phones = (
+        select(literal("phone").label("kind"), Subject.phone.label("val"))
+        .where(bidder, Subject.phone.isnot(None), Subject.phone != "")
+        .group_by(Subject.phone)
+        .having(func.count() > 1)
     )
-    subjects = subjects_result.all()
-
-    phones = [s.phone for s in subjects if s.phone]
-    emails = [s.email for s in subjects if s.email]
+    shared_emails = (
+        select(literal("email").label("kind"), Subject.email.label("val"))
+        .where(bidder, Subject.email.isnot(None), Subject.email != "")
+        .group_by(Subject.email)
+        .having(func.count() > 1)
+    )
+    shared_result = await db.execute(union_all(shared_phones, shared_emails))
+    shared = shared_result.all()
 
-    common_phones = [p for p in set(phones) if phones.count(p) > 1]
-    common_emails = [e for e in set(emails) if emails.count(e) > 1]
+    common_phones = [r.val for r in shared if r.kind == "phone"]
+    common_emails = [r.val for r in shared if r.kind == "email"]
 
     flag = bool(common_phones or common_emails)
 
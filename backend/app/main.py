@@ -1,6 +1,7 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
+from app.core.database import dispose_engine
 from app.api.v1 import router as api_router
 
 app = FastAPI(
@@ -22,6 +23,11 @@ app.add_middleware(
 app.include_router(api_router, prefix="/api/v1")
 
 
+@app.on_event("shutdown")
+async def shutdown():
+    await dispose_engine()
+
+
 @app.get("/health")
 async def health():
     return {"status": "ok", "version": "1.0.0"}
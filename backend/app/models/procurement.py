@@ -1,10 +1,29 @@
-from sqlalchemy import Column, BigInteger, String, DateTime, Boolean, Numeric, Integer, Text, JSON, Float, Index
+from sqlalchemy import (
+    Column, BigInteger, String, DateTime, Boolean, Numeric, Integer, Text, JSON, Float, Index, text,
+    Computed,
+)
 from sqlalchemy.dialects.postgresql import JSONB
 from app.core.database import Base
 
 
+def _cents(column: str) -> Column:
+    """BIGINT mirror of a Numeric(20, 2) money column, kept in sync by Postgres.
+    Sums and comparisons in the indicators run on these instead of NUMERIC."""
+    return Column(BigInteger, Computed(f"round({column} * 100)::bigint", persisted=True))
+
+
 # ─── RAW LAYER ───────────────────────────────────────────────────────────────
 
+def _jsonb_gin(name: str, column: str) -> Index:
+    """GIN over a JSONB column for `column @> '{...}'` lookups.
+    jsonb_path_ops only supports containment, and is smaller and faster for it."""
+    return Index(
+        name, column,
+        postgresql_using="gin",
+        postgresql_ops={column: "jsonb_path_ops"},
+    )
+
+
 class RawTrdBuy(Base):
     __tablename__ = "raw_trdbuy"
     id = Column(BigInteger, primary_key=True)
@@ -12,6 +31,8 @@ class RawTrdBuy(Base):
     fetched_at = Column(DateTime, nullable=False)
     source_version = Column(String(10), default="v3")
 
+    __table_args__ = (_jsonb_gin("ix_raw_trdbuy_payload_gin", "payload_jsonb"),)
+
 
 class RawLots(Base):
     __tablename__ = "raw_lots"
@@ -20,6 +41,8 @@ class RawLots(Base):
     fetched_at = Column(DateTime, nullable=False)
     source_version = Column(String(10), default="v3")
 
+    __table_args__ = (_jsonb_gin("ix_raw_lots_payload_gin", "payload_jsonb"),)
+
 
 class RawTrdApp(Base):
     __tablename__ = "raw_trdapp"
@@ -28,6 +51,8 @@ class RawTrdApp(Base):
     fetched_at = Column(DateTime, nullable=False)
     source_version = Column(String(10), default="v3")
 
+    __table_args__ = (_jsonb_gin("ix_raw_trdapp_payload_gin", "payload_jsonb"),)
+
 
 class RawContract(Base):
     __tablename__ = "raw_contract"
@@ -36,6 +61,8 @@ class RawContract(Base):
     fetched_at = Column(DateTime, nullable=False)
     source_version = Column(String(10), default="v3")
 
+    __table_args__ = (_jsonb_gin("ix_raw_contract_payload_gin", "payload_jsonb"),)
+
 
 class RawSubject(Base):
     __tablename__ = "raw_subject"
@@ -44,6 +71,8 @@ class RawSubject(Base):
     fetched_at = Column(DateTime, nullable=False)
     source_version = Column(String(10), default="v3")
 
+    __table_args__ = (_jsonb_gin("ix_raw_subject_payload_gin", "payload_jsonb"),)
+
 
 class RawRnu(Base):
     __tablename__ = "raw_rnu"
@@ -52,6 +81,8 @@ class RawRnu(Base):
     fetched_at = Column(DateTime, nullable=False)
     source_version = Column(String(10), default="v3")
 
+    __table_args__ = (_jsonb_gin("ix_raw_rnu_payload_gin", "payload_jsonb"),)
+
 
 class RawJournal(Base):
     __tablename__ = "raw_journal"
@@ -59,6 +90,8 @@ class RawJournal(Base):
     payload_jsonb = Column(JSONB, nullable=False)
     fetched_at = Column(DateTime, nullable=False)
 
+    __table_args__ = (_jsonb_gin("ix_raw_journal_payload_gin", "payload_jsonb"),)
+
 
 # ─── NORMALIZED LAYER ────────────────────────────────────────────────────────
 
@@ -69,12 +102,13 @@ class TrdBuy(Base):
     name_ru = Column(Text)
     name_kz = Column(Text)
     ref_trade_methods_id = Column(Integer)
-    publish_date = Column(DateTime, index=True)
+    publish_date = Column(DateTime)
     start_date = Column(DateTime)
     end_date = Column(DateTime)
     total_sum = Column(Numeric(20, 2))
+    total_sum_cents = _cents("total_sum")
     ref_buy_status_id = Column(Integer)
-    org_bin = Column(String(20), index=True)
+    org_bin = Column(String(20))
     system_id = Column(Integer)
     singl_org_sign = Column(Integer, default=0)
     is_light_industry = Column(Integer, default=0)
@@ -91,12 +125,13 @@ class TrdBuy(Base):
 class Lot(Base):
     __tablename__ = "lots"
     id = Column(BigInteger, primary_key=True)
-    trd_buy_id = Column(BigInteger, index=True)
+    trd_buy_id = Column(BigInteger)
     lot_number = Column(String(255))
     name_ru = Column(Text)
     name_kz = Column(Text)
     amount = Column(Numeric(20, 2))
-    customer_bin = Column(String(20), index=True)
+    amount_cents = _cents("amount")
+    customer_bin = Column(String(20))
     customer_name = Column(Text)
     dumping_flag = Column(Boolean, default=False)
     union_lots_flag = Column(Boolean, default=False)
@@ -113,6 +148,11 @@ class Lot(Base):
         Index("ix_lots_trd_buy_id", "trd_buy_id"),
         Index("ix_lots_customer_bin", "customer_bin"),
         Index("ix_lots_amount", "amount"),
+        # Covering: the lots/contract join on live rows is answered index-only
+        Index(
+            "ix_lots_trd_buy_id_live", "trd_buy_id",
+            postgresql_include=["id"], postgresql_where=text("is_deleted = false"),
+        ),
     )
 
 
@@ -138,21 +178,25 @@ class TrdAppLot(Base):
     lot_id = Column(BigInteger, index=True)
     status_id = Column(Integer)
     price = Column(Numeric(20, 2))
+    price_cents = _cents("price")
     amount = Column(Numeric(20, 2))
+    amount_cents = _cents("amount")
     discount_value = Column(Float)
     discount_price = Column(Numeric(20, 2))
+    discount_price_cents = _cents("discount_price")
 
 
 class Contract(Base):
     __tablename__ = "contract"
     id = Column(BigInteger, primary_key=True)
-    trd_buy_id = Column(BigInteger, index=True)
+    trd_buy_id = Column(BigInteger)
     contract_number = Column(String(100))
     contract_number_sys = Column(String(100))
     trd_buy_number_anno = Column(String(50))
-    customer_bin = Column(String(20), index=True)
-    supplier_biin = Column(String(20), index=True)
+    customer_bin = Column(String(20))
+    supplier_biin = Column(String(20))
     contract_sum_wnds = Column(Numeric(20, 2))
+    contract_sum_wnds_cents = _cents("contract_sum_wnds")
     sign_date = Column(DateTime)
     plan_exec_date = Column(DateTime)
     fakt_exec_date = Column(DateTime)
@@ -160,7 +204,7 @@ class Contract(Base):
     ref_contract_status_id = Column(Integer)
     ref_contract_type_id = Column(Integer)
     parent_id = Column(BigInteger, index=True)
-    root_id = Column(BigInteger, index=True)
+    root_id = Column(BigInteger)
     supplier_legal_address = Column(Text)
     customer_legal_address = Column(Text)
     is_gu = Column(Integer, default=0)
@@ -174,6 +218,15 @@ class Contract(Base):
         Index("ix_contract_customer_bin", "customer_bin"),
         Index("ix_contract_supplier_biin", "supplier_biin"),
         Index("ix_contract_root_id", "root_id"),
+        # Partial indexes for the FeatureEngine indicators, which only read live rows
+        Index("ix_contract_supplier_biin_live", "supplier_biin", postgresql_where=text("is_deleted = false")),
+        Index("ix_contract_customer_bin_live", "customer_bin", "sign_date", postgresql_where=text("is_deleted = false")),
+        # Covers the join from lots and the FeatureEngine's per-lot contract lookup
+        Index(
+            "ix_contract_trd_buy_id_live", "trd_buy_id",
+            postgresql_include=["id", "supplier_biin", "contract_sum_wnds"],
+            postgresql_where=text("is_deleted = false"),
+        ),
     )
 
 
@@ -215,6 +268,12 @@ class Subject(Base):
     last_update_at = Column(DateTime)
     is_deleted = Column(Boolean, default=False)
 
+    __table_args__ = (
+        Index("ix_subject_iin", "iin"),
+        Index("ix_subject_phone", "phone", postgresql_where=text("phone IS NOT NULL")),
+        Index("ix_subject_email", "email", postgresql_where=text("email IS NOT NULL")),
+    )
+
 
 class Rnu(Base):
     __tablename__ = "rnu"
@@ -241,6 +300,7 @@ class TreasuryPay(Base):
     dt_dog = Column(DateTime)
     item_description = Column(Text)
     pay_amount = Column(Numeric(20, 2))
+    pay_amount_cents = _cents("pay_amount")
     pay_date = Column(DateTime)
     ppn = Column(String(100))
     espk = Column(String(255))
@@ -256,7 +316,7 @@ class RiskFlag(Base):
     __tablename__ = "risk_flags"
     id = Column(BigInteger, primary_key=True, autoincrement=True)
     entity_type = Column(String(20), nullable=False)   # lot/tender/supplier/customer
-    entity_id = Column(String(255), nullable=False)
+    entity_id = Column(String(32), nullable=False)
     indicator_code = Column(String(255), nullable=False)
     flag_bool = Column(Boolean, default=False)
     value_numeric = Column(Float)
@@ -265,7 +325,8 @@ class RiskFlag(Base):
 
     __table_args__ = (
         Index("ix_risk_flags_entity", "entity_type", "entity_id"),
-        Index("ix_risk_flags_indicator", "entity_type", "entity_id", "indicator_code"),
+        Index("ix_risk_flags_indicator", "entity_type", "entity_id", "indicator_code", unique=True),
+        _jsonb_gin("ix_risk_flags_evidence_gin", "evidence_jsonb"),
     )
 
 
@@ -273,14 +334,16 @@ class RiskScore(Base):
     __tablename__ = "risk_scores"
     id = Column(BigInteger, primary_key=True, autoincrement=True)
     entity_type = Column(String(20), nullable=False)
-    entity_id = Column(String(255), nullable=False)
+    entity_id = Column(String(32), nullable=False)
     score = Column(Float, nullable=False, default=0.0)
     level = Column(String(10), nullable=False, default="LOW")  # LOW/MEDIUM/HIGH
     top_reasons_jsonb = Column(JSONB)
+    # Bit i set = indicator with `bit: i` in weights.yaml fired
+    flags_mask = Column(BigInteger, nullable=False, default=0, server_default="0")
     computed_at = Column(DateTime)
 
     __table_args__ = (
-        Index("ix_risk_scores_entity", "entity_type", "entity_id"),
+        Index("ix_risk_scores_entity", "entity_type", "entity_id", unique=True),
         Index("ix_risk_scores_score", "entity_type", "score"),
     )
 
@@ -289,7 +352,7 @@ class AnalystNote(Base):
     __tablename__ = "analyst_notes"
     id = Column(BigInteger, primary_key=True, autoincrement=True)
     entity_type = Column(String(20), nullable=False)
-    entity_id = Column(String(255), nullable=False)
+    entity_id = Column(String(32), nullable=False)
     note_text = Column(Text)
     label = Column(String(30))  # SUSPICIOUS/FALSE_POSITIVE/NEEDS_REVIEW/VERIFIED
     created_by = Column(Integer)
@@ -11,13 +11,20 @@ import sys
 import os
 sys.path.insert(0, "/app")
 
-from datetime import datetime
-from sqlalchemy.dialects.postgresql import insert as pg_insert
-from app.core.database import AsyncSessionLocal
+import uvloop
+from app.core.database import AsyncSessionLocal, engine
+from app.etl.bulk import copy_upsert, create_indexes, drop_secondary_indexes
 from app.etl.client import OWSClient
-from app.models.procurement import (
-    Lot, TrdApp, TrdAppLot, Contract, Rnu, TreasuryPay,
+from app.etl.pipeline import run_pipeline
+from app.etl.records import (
+    LOT_COLS, LOT_UPDATE_COLS, TRD_APP_COLS, TRD_APP_UPDATE_COLS,
+    TRD_APP_LOT_COLS, TRD_APP_LOT_UPDATE_COLS, CONTRACT_COLS, CONTRACT_UPDATE_COLS,
+    RNU_COLS, RNU_UPDATE_COLS, TREASURY_PAY_COLS, TREASURY_PAY_UPDATE_COLS,
+    lot_record, trd_app_record, trd_app_lot_record, contract_record,
+    rnu_record, treasury_pay_record, dedupe,
+    LotItem, TrdAppItem, ContractItem, RnuItem, TreasuryPayItem,
 )
+from app.etl.views import MV_CONTRACT_BUY_IDS, MV_LINKED_LOTS, refresh_view
 from app.features.engine import FeatureEngine
 
 logging.basicConfig(
@@ -27,251 +34,98 @@ logging.basicConfig(
 logger = logging.getLogger("sample_load")
 
 MAX_ROWS = 10_000  # лимит на каждую таблицу
+# Pages fetched ahead of each loader's DB writer
+QUEUE_SIZE = 2
+# Rows per transaction; a commit per OWS page would fsync the WAL every page
+COMMIT_ROWS = 5000
+# Loads are idempotent upserts: after a crash just re-run, so commits need
+# not wait for the WAL flush
+SYNCHRONOUS_COMMIT = False
+# Their non-unique indexes are dropped for the load and rebuilt afterwards
+LOADED_TABLES = ["lots", "trd_app", "trd_app_lots", "contract", "rnu", "treasury_pay"]
 
 
-def _parse_dt(val):
-    if not val:
-        return None
-    if isinstance(val, datetime):
-        return val
-    try:
-        return datetime.fromisoformat(str(val).replace(" ", "T").split(".")[0])
-    except Exception:
-        return None
+async def _write_lots(db, batch: list[LotItem]) -> int:
+    rows = dedupe([lot_record(item) for item in batch])
+    return await copy_upsert(db, "lots", rows, LOT_COLS, LOT_UPDATE_COLS)
 
 
-def _safe_decimal(val):
-    try:
-        return float(val) if val is not None else None
-    except Exception:
-        return None
+async def _write_trd_app(db, batch: list[TrdAppItem]) -> int:
+    app_rows = dedupe([trd_app_record(item) for item in batch])
+    app_lot_rows = dedupe([
+        trd_app_lot_record(item.id, al)
+        for item in batch
+        for al in item.app_lots or []
+    ])
+
+    await copy_upsert(db, "trd_app", app_rows, TRD_APP_COLS, TRD_APP_UPDATE_COLS)
+    await copy_upsert(
+        db, "trd_app_lots", app_lot_rows, TRD_APP_LOT_COLS, TRD_APP_LOT_UPDATE_COLS
+    )
+    return len(app_rows)
+
+
+async def _write_contracts(db, batch: list[ContractItem]) -> int:
+    rows = dedupe([contract_record(item) for item in batch])
+    return await copy_upsert(db, "contract", rows, CONTRACT_COLS, CONTRACT_UPDATE_COLS)
+
+
+async def _write_rnu(db, batch: list[RnuItem]) -> int:
+    rows = dedupe([rnu_record(item) for item in batch])
+    return await copy_upsert(db, "rnu", rows, RNU_COLS, RNU_UPDATE_COLS)
+
+
+async def _write_treasury_pay(db, batch: list[TreasuryPayItem]) -> int:
+    rows = dedupe([treasury_pay_record(item) for item in batch])
+    return await copy_upsert(
+        db, "treasury_pay", rows, TREASURY_PAY_COLS, TREASURY_PAY_UPDATE_COLS
+    )
 
 
 async def load_lots(client: OWSClient) -> int:
-    count = 0
     logger.info("=== Loading LOTS (limit %d) ===", MAX_ROWS)
-    async with AsyncSessionLocal() as db:
-        async for batch, next_cursor in client.paginate("/v3/lots"):
-            rows = []
-            for item in batch:
-                rows.append({
-                    "id": item["id"],
-                    "trd_buy_id": item.get("trd_buy_id") or item.get("buy_id"),
-                    "lot_number": item.get("lot_number") or str(item.get("id", "")),
-                    "name_ru": item.get("name_ru"),
-                    "name_kz": item.get("name_kz"),
-                    "amount": _safe_decimal(item.get("amount")),
-                    "customer_bin": item.get("customer_bin"),
-                    "customer_name": item.get("customer_name_ru"),
-                    "dumping_flag": bool(item.get("dumping_flag", False)),
-                    "union_lots_flag": bool(item.get("union_lots_flag", False)),
-                    "ref_lot_status_id": item.get("ref_lot_status_id"),
-                    "singl_org_sign": item.get("singl_org_sign", 0),
-                    "is_light_industry": item.get("is_light_industry", 0),
-                    "is_construction_work": item.get("is_construction_work", 0),
-                    "disable_person_id": item.get("disable_person_id", 0),
-                    "system_id": item.get("system_id"),
-                    "last_update_at": _parse_dt(item.get("index_date")),
-                    "is_deleted": False,
-                })
-            if rows:
-                stmt = pg_insert(Lot).values(rows)
-                stmt = stmt.on_conflict_do_update(
-                    index_elements=["id"],
-                    set_={c: stmt.excluded[c] for c in ["amount", "ref_lot_status_id", "dumping_flag", "last_update_at"]},
-                )
-                await db.execute(stmt)
-                await db.commit()
-                count += len(rows)
-                logger.info("Lots upserted: %d", count)
-
-            if count >= MAX_ROWS:
-                logger.info("Reached limit %d for lots, stopping.", MAX_ROWS)
-                break
-    return count
+    return await run_pipeline(
+        client.batches_only("/v3/lots", item_type=LotItem), _write_lots, "Lots",
+        match_limit=MAX_ROWS, commit_rows=COMMIT_ROWS, queue_size=QUEUE_SIZE,
+        synchronous_commit=SYNCHRONOUS_COMMIT,
+    )
 
 
 async def load_trd_app(client: OWSClient) -> int:
-    count = 0
     logger.info("=== Loading TRD_APP (limit %d) ===", MAX_ROWS)
-    async with AsyncSessionLocal() as db:
-        async for batch, next_cursor in client.paginate("/v3/trd-app"):
-            app_rows, app_lot_rows = [], []
-            for item in batch:
-                app_rows.append({
-                    "id": item["id"],
-                    "buy_id": item.get("buy_id"),
-                    "supplier_id": item.get("supplier_id"),
-                    "supplier_biin": item.get("supplier_bin_iin"),
-                    "cr_fio": item.get("cr_fio"),
-                    "mod_fio": item.get("mod_fio"),
-                    "prot_id": item.get("prot_id"),
-                    "prot_number": str(item.get("prot_number", "")),
-                    "date_apply": _parse_dt(item.get("date_apply")),
-                    "system_id": item.get("system_id"),
-                    "last_update_at": _parse_dt(item.get("index_date")),
-                })
-                for al in item.get("app_lots", []):
-                    app_lot_rows.append({
-                        "id": al["id"],
-                        "trd_app_id": item["id"],
-                        "lot_id": al.get("lot_id"),
-                        "status_id": al.get("status_id"),
-                        "price": _safe_decimal(al.get("price")),
-                        "amount": _safe_decimal(al.get("amount")),
-                        "discount_value": al.get("discount_value"),
-                        "discount_price": _safe_decimal(al.get("discount_price")),
-                    })
-
-            if app_rows:
-                stmt = pg_insert(TrdApp).values(app_rows)
-                stmt = stmt.on_conflict_do_update(
-                    index_elements=["id"],
-                    set_={"last_update_at": stmt.excluded.last_update_at},
-                )
-                await db.execute(stmt)
-            if app_lot_rows:
-                stmt = pg_insert(TrdAppLot).values(app_lot_rows)
-                stmt = stmt.on_conflict_do_update(
-                    index_elements=["id"],
-                    set_={c: stmt.excluded[c] for c in ["status_id", "price", "amount"]},
-                )
-                await db.execute(stmt)
-            await db.commit()
-            count += len(app_rows)
-            logger.info("TrdApp upserted: %d", count)
-
-            if count >= MAX_ROWS:
-                logger.info("Reached limit %d for trd_app, stopping.", MAX_ROWS)
-                break
-    return count
+    return await run_pipeline(
+        client.batches_only("/v3/trd-app", item_type=TrdAppItem), _write_trd_app, "TrdApp",
+        match_limit=MAX_ROWS, commit_rows=COMMIT_ROWS, queue_size=QUEUE_SIZE,
+        synchronous_commit=SYNCHRONOUS_COMMIT,
+    )
 
 
 async def load_contracts(client: OWSClient) -> int:
-    count = 0
     logger.info("=== Loading CONTRACTS (limit %d) ===", MAX_ROWS)
-    async with AsyncSessionLocal() as db:
-        async for batch, next_cursor in client.paginate("/v3/contract"):
-            rows = []
-            for item in batch:
-                rows.append({
-                    "id": item["id"],
-                    "trd_buy_id": item.get("trd_buy_id"),
-                    "contract_number": item.get("contract_number"),
-                    "contract_number_sys": item.get("contract_number_sys"),
-                    "trd_buy_number_anno": item.get("trd_buy_number_anno"),
-                    "customer_bin": item.get("customer_bin"),
-                    "supplier_biin": item.get("supplier_biin"),
-                    "contract_sum_wnds": _safe_decimal(item.get("contract_sum_wnds")),
-                    "sign_date": _parse_dt(item.get("sign_date") or item.get("crdate")),
-                    "plan_exec_date": _parse_dt(item.get("plan_exec_date")),
-                    "fakt_exec_date": _parse_dt(item.get("fakt_exec_date")),
-                    "fakt_sum": _safe_decimal(item.get("fakt_sum")),
-                    "ref_contract_status_id": item.get("ref_contract_status_id"),
-                    "ref_contract_type_id": item.get("ref_contract_type_id"),
-                    "parent_id": item.get("parent_id"),
-                    "root_id": item.get("root_id"),
-                    "supplier_legal_address": item.get("supplier_legal_address"),
-                    "customer_legal_address": item.get("customer_legal_address"),
-                    "is_gu": item.get("is_gu", 0),
-                    "exchange_rate": item.get("exchange_rate"),
-                    "system_id": item.get("system_id"),
-                    "last_update_at": _parse_dt(item.get("last_update_date")),
-                    "is_deleted": False,
-                })
-            if rows:
-                stmt = pg_insert(Contract).values(rows)
-                stmt = stmt.on_conflict_do_update(
-                    index_elements=["id"],
-                    set_={c: stmt.excluded[c] for c in [
-                        "contract_sum_wnds", "fakt_sum", "fakt_exec_date",
-                        "ref_contract_status_id", "last_update_at",
-                    ]},
-                )
-                await db.execute(stmt)
-                await db.commit()
-                count += len(rows)
-                logger.info("Contracts upserted: %d", count)
-
-            if count >= MAX_ROWS:
-                logger.info("Reached limit %d for contracts, stopping.", MAX_ROWS)
-                break
-    return count
+    return await run_pipeline(
+        client.batches_only("/v3/contract", item_type=ContractItem), _write_contracts, "Contracts",
+        match_limit=MAX_ROWS, commit_rows=COMMIT_ROWS, queue_size=QUEUE_SIZE,
+        synchronous_commit=SYNCHRONOUS_COMMIT,
+    )
 
 
 async def load_rnu(client: OWSClient) -> int:
-    count = 0
     logger.info("=== Loading RNU (full — small table) ===")
-    async with AsyncSessionLocal() as db:
-        async for batch, next_cursor in client.paginate("/v3/rnu"):
-            rows = []
-            for item in batch:
-                rows.append({
-                    "id": item["id"],
-                    "pid": item.get("pid"),
-                    "supplier_biin": item.get("biin") or item.get("iin"),
-                    "supplier_name_ru": item.get("name_ru"),
-                    "start_date": _parse_dt(item.get("start_date")),
-                    "end_date": _parse_dt(item.get("end_date")),
-                    "reason": item.get("reason_ru") or item.get("reason"),
-                    "system_id": item.get("system_id", 3),
-                    "is_active": True,
-                })
-            if rows:
-                stmt = pg_insert(Rnu).values(rows)
-                stmt = stmt.on_conflict_do_update(
-                    index_elements=["id"],
-                    set_={c: stmt.excluded[c] for c in ["end_date", "is_active"]},
-                )
-                await db.execute(stmt)
-                await db.commit()
-                count += len(rows)
-                logger.info("RNU upserted: %d", count)
-            # RNU is small, load all
-    return count
+    # RNU is small, load all
+    return await run_pipeline(
+        client.batches_only("/v3/rnu", item_type=RnuItem), _write_rnu, "RNU",
+        commit_rows=COMMIT_ROWS, queue_size=QUEUE_SIZE,
+        synchronous_commit=SYNCHRONOUS_COMMIT,
+    )
 
 
 async def load_treasury_pay(client: OWSClient) -> int:
-    count = 0
     logger.info("=== Loading TREASURY_PAY (limit %d) ===", MAX_ROWS)
-    async with AsyncSessionLocal() as db:
-        async for batch, next_cursor in client.paginate("/v3/treasury-pay"):
-            rows = []
-            for item in batch:
-                rows.append({
-                    "id": item["id"],
-                    "nom_za": item.get("nom_za"),
-                    "contract_id": item.get("contract_id"),
-                    "dt_reg": _parse_dt(item.get("dt_reg")),
-                    "supplier": item.get("supplier"),
-                    "rnn_supplier": item.get("rnn_supplier"),
-                    "nom_dog": item.get("nom_dog"),
-                    "dt_dog": _parse_dt(item.get("dt_dog")),
-                    "item_description": item.get("item_description"),
-                    "pay_amount": _safe_decimal(item.get("pay_amount")),
-                    "pay_date": _parse_dt(item.get("pay_date")),
-                    "ppn": item.get("ppn"),
-                    "espk": item.get("espk"),
-                    "gu": item.get("gu"),
-                    "fin_source": item.get("fin_source"),
-                    "index_date": _parse_dt(item.get("index_date")),
-                    "system_id": item.get("system_id"),
-                })
-            if rows:
-                stmt = pg_insert(TreasuryPay).values(rows)
-                stmt = stmt.on_conflict_do_update(
-                    index_elements=["id"],
-                    set_={"pay_amount": stmt.excluded.pay_amount},
-                )
-                await db.execute(stmt)
-                await db.commit()
-                count += len(rows)
-                logger.info("TreasuryPay upserted: %d", count)
-
-            if count >= MAX_ROWS:
-                logger.info("Reached limit %d for treasury_pay, stopping.", MAX_ROWS)
-                break
-    return count
+    return await run_pipeline(
+        client.batches_only("/v3/treasury-pay", item_type=TreasuryPayItem), _write_treasury_pay, "TreasuryPay",
+        match_limit=MAX_ROWS, commit_rows=COMMIT_ROWS, queue_size=QUEUE_SIZE,
+        synchronous_commit=SYNCHRONOUS_COMMIT,
+    )
 
 
 async def run_feature_engine():
@@ -283,14 +137,35 @@ async def run_feature_engine():
 
 
 async def main():
-    client = OWSClient()
-    summary = {}
-
-    summary["lots"] = await load_lots(client)
-    summary["trd_app"] = await load_trd_app(client)
-    summary["contracts"] = await load_contracts(client)
-    summary["rnu"] = await load_rnu(client)
-    summary["treasury_pay"] = await load_treasury_pay(client)
+    # Tables are independent (no FKs): run the loaders side by side, each on
+    # its own session, so one's HTTP wait overlaps another's DB work. The
+    # shared client caps requests in flight.
+    loaders = {
+        "lots": load_lots,
+        "trd_app": load_trd_app,
+        "contracts": load_contracts,
+        "rnu": load_rnu,
+        "treasury_pay": load_treasury_pay,
+    }
+    # One index build per table beats B-tree maintenance on every upserted row
+    async with AsyncSessionLocal() as db:
+        index_ddls = await drop_secondary_indexes(db, LOADED_TABLES)
+    logger.info("Dropped %d secondary indexes for the load", len(index_ddls))
+    try:
+        # TaskGroup: if one loader fails the others are cancelled, so none is
+        # still writing when the indexes are rebuilt below
+        async with OWSClient() as client, asyncio.TaskGroup() as tg:
+            tasks = {name: tg.create_task(load(client)) for name, load in loaders.items()}
+    finally:
+        # Also after a failed load; the Feature Engine below needs them
+        logger.info("Rebuilding %d indexes", len(index_ddls))
+        await create_indexes(engine, index_ddls)
+    summary = {name: task.result() for name, task in tasks.items()}
+
+    # Only now are lots and contracts both complete and indexed
+    async with AsyncSessionLocal() as db:
+        await refresh_view(db, MV_CONTRACT_BUY_IDS)
+        await refresh_view(db, MV_LINKED_LOTS)
 
     logger.info("=== Load complete: %s ===", summary)
 
@@ -299,4 +174,6 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    # uvloop: the five concurrent loaders multiplex HTTP pages and COPY
+    # traffic on this one loop
+    uvloop.run(main())
@@ -1,6 +1,7 @@
-import asyncio
 import os
 import aiohttp
+import orjson
+import uvloop
 from dotenv import load_dotenv
 
 async def main():
@@ -10,11 +11,13 @@ async def main():
         print("OWS_TOKEN not found")
         return
 
-    async with aiohttp.ClientSession() as session:
+    # One session, kept-alive connections: both requests reuse the TLS handshake
+    connector = aiohttp.TCPConnector(limit=16, keepalive_timeout=30)
+    async with aiohttp.ClientSession(connector=connector) as session:
         # Check current cursor (15997176)
         print("Checking default list (latest):")
         async with session.get("https://ows.goszakup.gov.kz/v3/trd-buy?limit=1", headers={"Authorization": f"Bearer {token}"}) as resp:
-            data = await resp.json()
+            data = orjson.loads(await resp.read())
             if data['items']:
                 print(f"Latest ID: {data['items'][0]['id']}, Date: {data['items'][0]['publishDate']}")
             else:
@@ -24,7 +27,7 @@ async def main():
         cursor = "https://ows.goszakup.gov.kz/v3/trd-buy?page=next&search_after=15997176"
         print(f"\nChecking cursor: {cursor}")
         async with session.get(cursor, headers={"Authorization": f"Bearer {token}"}) as resp:
-            data = await resp.json()
+            data = orjson.loads(await resp.read())
             if 'items' in data and data['items']:
                 first_item = data['items'][0]
                 print(f"Cursor Item ID: {first_item['id']}, Date: {first_item['publishDate']}")
@@ -32,4 +35,4 @@ async def main():
                 print("Cursor empty or invalid")
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    uvloop.run(main())